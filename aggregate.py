@@ -0,0 +1,236 @@
+"""Population-weighted >50K estimates for a whole survey-style dataset.
+
+    python aggregate.py adult.csv --by occupation gender
+    python aggregate.py census.parquet --by "age band" --min-rows 30
+
+Each census record stands for ``fnlwgt`` people, so population shares
+weight every row by it. The file is scored chunk by chunk, and each chunk
+is reduced into a cube. The cube has one row per distinct combination of
+the categorical inputs and of bands of age, educational years, hours per
+week and capital gain. Each cube row keeps these sums:
+
+* the weight;
+* weight x P(>50K);
+* weight x predicted label;
+* weight x true label, when the file has an ``income`` column.
+
+Any grouping of those dimensions is a group-by-sum over the cube, so a
+new breakdown never rescores the data. The cube is never larger than the
+data, and is usually much smaller. Building it holds one scored chunk plus
+the cube; chunks go through Predictor.predict_frame, which scores them
+with the pipeline's own classifier rather than the compiled evaluator.
+
+Cubes are cached on disk under the SHA-256 of the dataset and the model
+hash, so a restart or another session reuses them.
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from batch import DEFAULT_CHUNK_SIZE, detect_format, iter_chunks, prepare_features, validate_columns
+from schema import ATTRIBUTE_LABELS, CATEGORICAL_COLUMNS, income_labels
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+CACHE_DIR = os.path.join(BASE_DIR, ".aggregate_cache")
+# Bump when the dimensions or bands change, so old cubes are not reused.
+CUBE_VERSION = 1
+
+LABEL_COLUMN = "income"
+
+# name: (input column, left-closed bin edges, labels)
+BANDS = {
+    "age band": ("age", [25, 35, 45, 55, 65], ["<25", "25-34", "35-44", "45-54", "55-64", "65+"]),
+    "education band": (
+        "educational-num", [9, 10, 13, 14], ["Below HS", "HS grad", "Some college", "Bachelors", "Advanced"]
+    ),
+    "hours band": ("hours-per-week", [35, 41, 51], ["<35", "35-40", "41-50", "51+"]),
+    "capital gain band": ("capital-gain", [1, 5000], ["None", "<5K", "5K+"]),
+}
+DIMENSIONS = CATEGORICAL_COLUMNS + list(BANDS)
+MEASURES = ["rows", "weight", "weighted_probability", "weighted_prediction", "labelled_weight", "weighted_label"]
+
+
+def dimension_label(dimension):
+    return ATTRIBUTE_LABELS.get(dimension, dimension.capitalize())
+
+
+def dimension_frame(features):
+    """The cube dimensions of prepared feature rows."""
+    frame = features[CATEGORICAL_COLUMNS].copy()
+    for name, (column, edges, labels) in BANDS.items():
+        codes = np.searchsorted(edges, features[column].to_numpy(), side="right")
+        frame[name] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+    return frame
+
+
+def _collapse(cells):
+    return cells.groupby(DIMENSIONS, observed=True, sort=False)[MEASURES].sum().reset_index()
+
+
+def reduce_chunk(predictor, chunk):
+    """Score one chunk and sum it into cube cells; returns ``(cells, invalid_rows)``."""
+    features, valid = prepare_features(chunk)
+    features = features[valid]
+    cells = dimension_frame(features)
+    if len(features):
+        # Chunks are far above inference.COMPILED_MAX_ROWS, so this is
+        # sklearn's batch path and adds little beyond the chunk itself.
+        predictions, probabilities = predictor.predict_frame(features)
+    else:
+        predictions = probabilities = np.zeros(0)
+    weight = features["fnlwgt"].to_numpy(dtype=np.float64)
+    cells["rows"] = 1
+    cells["weight"] = weight
+    cells["weighted_probability"] = weight * probabilities
+    cells["weighted_prediction"] = weight * np.asarray(predictions, dtype=np.float64)
+    if LABEL_COLUMN in chunk.columns:
+        labels = income_labels(chunk[LABEL_COLUMN][valid]).to_numpy(dtype=np.float64)
+        known = ~np.isnan(labels)
+        cells["labelled_weight"] = weight * known
+        cells["weighted_label"] = weight * np.where(known, labels, 0.0)
+    else:
+        cells["labelled_weight"] = cells["weighted_label"] = 0.0
+    return _collapse(cells), int((~valid).sum())
+
+
+class PopulationCube:
+    """Summed cube cells of one scored dataset."""
+
+    def __init__(self, cells, invalid_rows=0):
+        self.cells = cells
+        self.invalid_rows = invalid_rows
+
+    @classmethod
+    def build(cls, predictor, source, fmt, chunksize=DEFAULT_CHUNK_SIZE, progress=None):
+        """Score ``source`` chunk by chunk. ``progress`` is called as in batch.score_file."""
+        validate_columns(source, fmt)
+        cells, invalid_rows, rows_done = None, 0, 0
+        for chunk, fraction in iter_chunks(source, fmt, chunksize):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            part, invalid = reduce_chunk(predictor, chunk)
+            # Merge after every chunk, so memory stays bounded by one chunk plus the cube.
+            cells = part if cells is None else _collapse(pd.concat([cells, part], ignore_index=True))
+            invalid_rows += invalid
+            rows_done += len(chunk)
+            if progress is not None:
+                progress(rows_done, fraction)
+        if cells is None:
+            cells = pd.DataFrame(columns=DIMENSIONS + MEASURES)
+        return cls(cells, invalid_rows)
+
+    @property
+    def rows(self):
+        return int(self.cells["rows"].sum())
+
+    @property
+    def has_labels(self):
+        return bool(self.cells["labelled_weight"].sum() > 0)
+
+    def estimate(self, by=(), min_rows=0):
+        """Weighted >50K shares for each group of the ``by`` dimensions, or for everyone.
+
+        ``expected_share`` averages P(>50K), ``predicted_share`` counts
+        predicted labels and ``observed_share`` counts true labels, each
+        weighted by fnlwgt. Groups with fewer than ``min_rows`` records
+        are left out.
+        """
+        by = list(by)
+        unknown = [d for d in by if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimension(s): {', '.join(unknown)}. Choose from: {', '.join(DIMENSIONS)}.")
+        if by:
+            totals = self.cells.groupby(by, observed=True)[MEASURES].sum()
+        else:
+            totals = self.cells[MEASURES].sum().to_frame().T
+        result = pd.DataFrame({
+            "rows": totals["rows"].astype(np.int64),
+            "population": totals["weight"],
+            "population_share": totals["weight"] / self.cells["weight"].sum(),
+            "expected_share": totals["weighted_probability"] / totals["weight"],
+            "predicted_share": totals["weighted_prediction"] / totals["weight"],
+        }, index=totals.index)
+        if self.has_labels:
+            result["observed_share"] = totals["weighted_label"] / totals["labelled_weight"].replace(0, np.nan)
+        result = result[result["rows"] >= min_rows]
+        return result.reset_index() if by else result.reset_index(drop=True)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cells = self.cells.copy()
+        cells.attrs["invalid_rows"] = self.invalid_rows
+        staging = path + ".tmp"
+        cells.to_parquet(staging, index=False)
+        os.replace(staging, path)
+
+    @classmethod
+    def load(cls, path):
+        cells = pd.read_parquet(path)
+        return cls(cells, int(cells.attrs.get("invalid_rows", 0)))
+
+
+def data_sha256(source):
+    """SHA-256 of a file path or an in-memory upload."""
+    if isinstance(source, (str, os.PathLike)):
+        from prediction_cache import file_sha256
+        return file_sha256(source)
+    digest = hashlib.sha256(source.getvalue()).hexdigest()
+    source.seek(0)
+    return digest
+
+
+def cube_path(data_hash, model_hash, cache_dir=CACHE_DIR):
+    key = hashlib.sha256(f"{CUBE_VERSION}:{data_hash}:{model_hash}".encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, f"cube-{key}.parquet")
+
+
+def load_or_build(predictor, source, fmt, data_hash=None, cache_dir=CACHE_DIR, chunksize=DEFAULT_CHUNK_SIZE, progress=None):
+    """The dataset's PopulationCube from the disk cache, scoring it only on a miss.
+
+    Models without a hash (see inference.Predictor) are never cached.
+    """
+    if predictor.model_hash is None:
+        return PopulationCube.build(predictor, source, fmt, chunksize, progress)
+    path = cube_path(data_hash or data_sha256(source), predictor.model_hash, cache_dir)
+    if os.path.exists(path):
+        return PopulationCube.load(path)
+    cube = PopulationCube.build(predictor, source, fmt, chunksize, progress)
+    cube.save(path)
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="fnlwgt-weighted >50K estimates for a CSV or Parquet dataset.")
+    parser.add_argument("data")
+    parser.add_argument("--by", nargs="*", default=[], metavar="DIMENSION",
+                        help=f"group by these dimensions: {', '.join(DIMENSIONS)}")
+    parser.add_argument("--min-rows", type=int, default=0, help="leave out groups with fewer records")
+    parser.add_argument("--model", default=MODEL_PATH, help="pipeline pickle or model artifact directory")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", help="also write the estimates to this CSV")
+    args = parser.parse_args(argv)
+
+    import time
+
+    from inference import load_predictor
+
+    predictor = load_predictor(args.model)
+    start = time.perf_counter()
+    cube = load_or_build(predictor, args.data, detect_format(args.data), cache_dir=args.cache_dir, chunksize=args.chunksize)
+    loaded = time.perf_counter()
+    estimates = cube.estimate(args.by, args.min_rows)
+    queried = time.perf_counter()
+    with pd.option_context("display.max_rows", 200, "display.width", 160):
+        print(estimates.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    print(f"\n{cube.rows:,} rows in {len(cube.cells):,} cube cells ({cube.invalid_rows:,} invalid rows skipped); "
+          f"cube {loaded - start:.2f}s, query {(queried - loaded) * 1000:.1f} ms")
+    if args.out:
+        estimates.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
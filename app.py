@@ -1,8 +1,21 @@
 import streamlit as st
-import pandas as pd
-import joblib
-import base64
 import os
+import tempfile
+import time
+
+from assets import apply_page_style
+from batch import DEFAULT_CHUNK_SIZE, SchemaError, detect_format, score_file
+from contributions import contribution_figure
+from counterfactual import COSTS, HOURS_STEP, describe_changes, find_counterfactuals
+from layout import render_footer, render_nav
+from metrics import start_metrics_server
+from model_store import contribution_engine, get_predictor, prediction_logger
+from prediction_cache import PREDICTION_CACHE, canonical_key
+from schema import (
+    FEATURE_COLUMNS, GENDER_OPTIONS, MARITAL_STATUS_OPTIONS, NATIVE_COUNTRY_OPTIONS, NUMERIC_COLUMNS,
+    OCCUPATION_OPTIONS, RACE_OPTIONS, RELATIONSHIP_OPTIONS, WORKCLASS_OPTIONS
+)
+from whatif import ATTRIBUTE_LABELS, SWEEPABLE_ATTRIBUTES, heatmap_figure, what_if_grid
 
 st.set_page_config(
     page_title="Employee Salary Prediction",
@@ -11,162 +24,61 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-BASE_DIR = os.path.dirname(__file__)
-CSS_PATH = os.path.join(BASE_DIR, "style.css")
-JS_PATH = os.path.join(BASE_DIR, "script.js")
-IMG_PATH = os.path.join(BASE_DIR, "background.jpeg")
-MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
-
-def get_base64_image(image_path):
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        st.error(f"Error: Background image not found at {image_path}. Please ensure 'background.jpeg' is in the same directory as 'app.py'.")
-        return None
-
-def load_css(file_name):
-    try:
-        with open(file_name, "r") as f:
-            return f.read()
-    except FileNotFoundError:
-        return ""
+apply_page_style(missing_background_message="Background image not loaded. Using default styling.")
 
-def load_js(file_name):
-    try:
-        with open(file_name, "r") as f:
-            return f.read()
-    except FileNotFoundError:
-        return ""
-
-img_b64 = get_base64_image(IMG_PATH)
-css_content = load_css(CSS_PATH)
-js_content = load_js(JS_PATH)
-
-if img_b64:
-    page_bg_img_style = f"""
-    <style>
-    .stApp {{
-        background-image: url("data:image/jpeg;base64,{img_b64}");
-        background-size: cover;
-        background-position: center;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    {css_content}
-    </style>
-    <script type="text/javascript">
-    {js_content}
-    </script>
-    """
-    if hasattr(st, 'html'):
-        st.html(page_bg_img_style)
-    else:
-        st.markdown(page_bg_img_style, unsafe_allow_html=True)
-else:
-    st.warning("Background image not loaded. Using default styling.")
-    fallback_css_and_scripts = f"""
-    <style>
-    {css_content}
-    </style>
-    <script type="text/javascript">
-    {js_content}
-    </script>
-    """
-    if hasattr(st, 'html'):
-        st.html(fallback_css_and_scripts)
-    else:
-        st.markdown(fallback_css_and_scripts, unsafe_allow_html=True)
-
-@st.cache_resource
-def load_model():
-    try:
-        pipeline = joblib.load(MODEL_PATH)
-        return pipeline
-    except FileNotFoundError:
-        st.error(f"Error: Model file not found at {MODEL_PATH}. Please ensure 'best_model_pipeline2.pkl' is in the same directory as 'app.py'.")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        st.stop()
-
-pipeline = load_model()
-
-if pipeline is None:
+if get_predictor() is None:
     st.stop()
 
+# Optional Prometheus endpoint; per-stage timings need SALARY_METRICS=1 too.
+if os.environ.get("SALARY_METRICS_PORT"):
+    start_metrics_server(int(os.environ["SALARY_METRICS_PORT"]), cache=PREDICTION_CACHE)
+
 # CHANGE 1: Moved the buttons to the top-right corner
-st.markdown(
-    """
-    <div class="top-right-buttons">
-        <a href="/Attribute_Explanation" target="_self" class="nav-button">
-            Explain Attributes
-        </a>
-        <a href="/Model_Explanation" target="_self" class="nav-button">
-            How Model Works
-        </a>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+render_nav()
 
 st.markdown("<h1 style='text-align: center; color: #FFD700;'>💰 Employee Salary Predictor 💰</h1>", unsafe_allow_html=True)
 st.markdown("<p class='subheader-text'>Predicting salary based on various employee attributes.</p>", unsafe_allow_html=True)
 
 st.markdown("---")
 
-st.subheader("Employee Information")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    age = st.slider("Age", 17, 75, 30)
-    education_num = st.slider("Educational Years", 1, 16, 10)
-    workclass = st.selectbox("Workclass", [
-        "Private", "Self-emp-not-inc", "Local-gov", "State-gov",
-        "Self-emp-inc", "Federal-gov", "Without-pay", "Never-worked"
-    ])
-    occupation = st.selectbox("Occupation", [
-        "Prof-specialty", "Craft-repair", "Exec-managerial",
-        "Adm-clerical", "Sales", "Other-service", "Machine-op-inspct",
-        "Transport-moving", "Handlers-cleaners", "Farming-fishing",
-        "Tech-support", "Protective-serv", "Priv-house-serv",
-        "Armed-Forces"
-    ])
-    gender = st.radio("Gender", ["Male", "Female"])
-
-with col2:
-    marital_status = st.selectbox("Marital Status", [
-        "Married-civ-spouse", "Never-married", "Divorced",
-        "Separated", "Widowed", "Married-spouse-absent", "Married-AF-spouse"
-    ])
-    relationship = st.selectbox("Relationship", [
-        "Husband", "Not-in-family", "Own-child", "Unmarried",
-        "Wife", "Other-relative"
-    ])
-    race = st.selectbox("Race", [
-        "White", "Black", "Asian-Pac-Islander", "Amer-Indian-Eskimo", "Other"
-    ])
-    native_country = st.selectbox("Native Country", [
-        "United-States", "Mexico", "Philippines", "Germany", "Canada",
-        "Puerto-Rico", "El-Salvador", "India", "Cuba", "England",
-        "Jamaica", "South", "China", "Italy", "Dominican-Republic",
-        "Vietnam", "Guatemala", "Japan", "Poland", "Columbia",
-        "Taiwan", "Haiti", "Iran", "Portugal", "Nicaragua",
-        "Peru", "France", "Greece", "Ecuador", "Ireland",
-        "Hong", "Cambodia", "Trinadad&Tobago", "Laos", "Thailand",
-        "Yugoslavia", "Outlying-US(Guam-USVI-etc)", "Hungary",
-        "Honduras", "Scotland", "Holand-Netherlands"
-    ])
-    hours_per_week = st.slider("Hours per Week", 1, 99, 40)
-    capital_gain = st.number_input("Capital Gain", min_value=0, max_value=100000, value=0, step=100)
-    capital_loss = st.number_input("Capital Loss", min_value=0, max_value=100000, value=0, step=100)
-    fnlwgt = st.number_input("Fnlwgt (Final Weight)", min_value=10000, max_value=1000000, value=150000, step=1000)
-
-# CHANGE 2: Centered the "Predict Salary Range" button
-st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
-if st.button("Predict Salary Range", key="predict_button"):
-    input_data = pd.DataFrame([{
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_what_if(_predictor, model_hash, profile_key, x_attribute, y_attribute):
+    return what_if_grid(_predictor, dict(zip(FEATURE_COLUMNS, profile_key)), x_attribute, y_attribute)
+
+@st.cache_data(max_entries=64, show_spinner="Searching for changes...")
+def cached_counterfactuals(_predictor, model_hash, profile_key):
+    return find_counterfactuals(_predictor, dict(zip(FEATURE_COLUMNS, profile_key)))
+
+# Widget changes rerun only this fragment; the style block, header and footer
+# are sent once per page load. The what-if explorer is part of it because it
+# must follow the current profile. Each fragment fetches the predictor on
+# every run, so a fragment rerun after a model swap uses the new model.
+@st.fragment
+def prediction_panel():
+    predictor = get_predictor()
+
+    st.subheader("Employee Information")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        age = st.slider("Age", 17, 75, 30)
+        education_num = st.slider("Educational Years", 1, 16, 10)
+        workclass = st.selectbox("Workclass", WORKCLASS_OPTIONS)
+        occupation = st.selectbox("Occupation", OCCUPATION_OPTIONS)
+        gender = st.radio("Gender", GENDER_OPTIONS)
+
+    with col2:
+        marital_status = st.selectbox("Marital Status", MARITAL_STATUS_OPTIONS)
+        relationship = st.selectbox("Relationship", RELATIONSHIP_OPTIONS)
+        race = st.selectbox("Race", RACE_OPTIONS)
+        native_country = st.selectbox("Native Country", NATIVE_COUNTRY_OPTIONS)
+        hours_per_week = st.slider("Hours per Week", 1, 99, 40)
+        capital_gain = st.number_input("Capital Gain", min_value=0, max_value=100000, value=0, step=100)
+        capital_loss = st.number_input("Capital Loss", min_value=0, max_value=100000, value=0, step=100)
+        fnlwgt = st.number_input("Fnlwgt (Final Weight)", min_value=10000, max_value=1000000, value=150000, step=1000)
+
+    input_data = {
         'age': age,
         'workclass': workclass,
         'fnlwgt': fnlwgt,
@@ -180,47 +92,177 @@ if st.button("Predict Salary Range", key="predict_button"):
         'capital-loss': capital_loss,
         'hours-per-week': hours_per_week,
         'native-country': native_country
-    }])
+    }
 
+    # CHANGE 2: Centered the "Predict Salary Range" button
+    st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
+    if st.button("Predict Salary Range", key="predict_button"):
+        try:
+            start = time.perf_counter()
+            prediction, probability = predictor.predict_record(input_data)
+            logger = prediction_logger()
+            if logger is not None:
+                logger.log(input_data, prediction, probability, time.perf_counter() - start, predictor.model_hash)
+
+            st.markdown("---")
+            st.markdown("<h2 style='text-align: center; color: #111111;'>Predicted Salary Range</h2>", unsafe_allow_html=True)
+
+            if prediction == 0:
+                st.markdown("<div style='text-align: center; font-size: 2em; color: #111111; font-weight: bold;'>&#60;=50K</div>", unsafe_allow_html=True)
+            else:
+                st.markdown("<div style='text-align: center; font-size: 2em; color: #111111; font-weight: bold;'>&#62;50K</div>", unsafe_allow_html=True)
+
+            st.balloons()
+
+            engine = contribution_engine(predictor, predictor.model_hash)
+            if engine is not None:
+                with st.expander("Why this prediction?", expanded=True):
+                    bias, contributions = engine.explain_record(input_data)
+                    unit = "log-odds" if engine.space == "log-odds" else "P(>50K)"
+                    st.write(
+                        f"How much each attribute moved the model's score ({unit}) away from its average "
+                        f"of {bias:+.3f}. Green bars push towards >50K, red bars towards <=50K."
+                    )
+                    st.pyplot(contribution_figure(contributions, f"Contribution ({unit})"))
+        except Exception as e:
+            st.error(f"An error occurred during prediction: {e}")
+            st.info("Please check your input values and ensure the model is loaded correctly.")
+
+    st.markdown("</div>", unsafe_allow_html=True) # Close the centered div
+
+    st.markdown("---")
+
+    with st.expander("What-If Explorer"):
+        st.write(
+            "See how the chance of earning >50K changes when one or two attributes of the profile above "
+            "are swept over their full range. The whole grid is scored in a single model call."
+        )
+        wcol1, wcol2 = st.columns(2)
+        x_attribute = wcol1.selectbox(
+            "Sweep (x-axis)", SWEEPABLE_ATTRIBUTES, index=SWEEPABLE_ATTRIBUTES.index('age'),
+            format_func=ATTRIBUTE_LABELS.get, key="whatif_x"
+        )
+        y_attribute = wcol2.selectbox(
+            "Against (y-axis)", [None] + SWEEPABLE_ATTRIBUTES, index=1 + SWEEPABLE_ATTRIBUTES.index('hours-per-week'),
+            format_func=lambda a: "Nothing (single sweep)" if a is None else ATTRIBUTE_LABELS[a], key="whatif_y"
+        )
+        if y_attribute == x_attribute:
+            y_attribute = None
+        if st.toggle("Show what-if results", key="whatif_toggle"):
+            scores = cached_what_if(predictor, predictor.model_hash, canonical_key(input_data), x_attribute, y_attribute)
+            if y_attribute:
+                st.pyplot(heatmap_figure(scores, input_data))
+            else:
+                sweep = scores.iloc[0].rename("P(>50K)")
+                if x_attribute in NUMERIC_COLUMNS:
+                    st.line_chart(sweep)
+                else:
+                    st.bar_chart(sweep)
+
+    with st.expander("What would it take to reach >50K?"):
+        st.write(
+            "The cheapest changes to educational years (upwards only), hours per week, occupation or workclass "
+            "that would move the profile entered above to a >50K prediction. Each extra year of education costs "
+            f"{COSTS['educational-num']:g}, each {HOURS_STEP} hours per week more or less "
+            f"{COSTS['hours-per-week'] * HOURS_STEP:g}, a new workclass {COSTS['workclass']:g} and a new occupation "
+            f"{COSTS['occupation']:g}."
+        )
+        if st.toggle("Search for changes", key="counterfactual_toggle"):
+            search = cached_counterfactuals(predictor, predictor.model_hash, canonical_key(input_data))
+            if search["already_above"]:
+                st.success(f"This profile is already predicted >50K (P = {search['base_probability']:.1%}).")
+            elif search["solutions"]:
+                st.dataframe(
+                    [{"Changes": describe_changes(s["changes"]), "Cost": round(s["cost"], 2),
+                      "P(>50K)": f"{s['probability']:.1%}"} for s in search["solutions"]],
+                    use_container_width=True, hide_index=True
+                )
+            else:
+                st.warning("No combination of these changes reaches >50K for this profile.")
+                if search["closest"] is not None and search["stopped"] == "time budget":
+                    closest = search["closest"]
+                    st.write(f"Closest found: {describe_changes(closest['changes'])} (P = {closest['probability']:.1%}).")
+            st.caption(
+                f"Scored {search['scored']:,} of {search['candidates']:,} candidates in {search['model_calls']} "
+                f"model calls ({search['seconds'] * 1000:.0f} ms); {search['pruned']:,} pruned"
+                + ("; stopped at the time budget." if search["stopped"] == "time budget" else ".")
+            )
+
+
+prediction_panel()
+
+st.markdown("---")
+
+def remove_file(path):
     try:
-        prediction = pipeline.predict(input_data)[0]
-
-        st.markdown("---")
-        st.markdown("<h2 style='text-align: center; color: #111111;'>Predicted Salary Range</h2>", unsafe_allow_html=True)
-        
-        if prediction == 0:
-            st.markdown("<div style='text-align: center; font-size: 2em; color: #111111; font-weight: bold;'>&#60;=50K</div>", unsafe_allow_html=True)
-        else:
-            st.markdown("<div style='text-align: center; font-size: 2em; color: #111111; font-weight: bold;'>&#62;50K</div>", unsafe_allow_html=True)
-        
-        st.balloons()
-    except Exception as e:
-        st.error(f"An error occurred during prediction: {e}")
-        st.info("Please check your input values and ensure the model is loaded correctly.")
-
-st.markdown("</div>", unsafe_allow_html=True) # Close the centered div
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def batch_output_dir():
+    # One temporary directory per session. TemporaryDirectory removes itself
+    # when the session state holding it is garbage collected, and at exit.
+    if "batch_output_dir" not in st.session_state:
+        st.session_state["batch_output_dir"] = tempfile.TemporaryDirectory(prefix="salary_batch_")
+    return st.session_state["batch_output_dir"].name
+
+# Uploads, scoring and downloads rerun only this fragment.
+@st.fragment
+def batch_panel():
+    predictor = get_predictor()
+
+    with st.expander("Batch Scoring (CSV / Parquet)"):
+        st.write(
+            "Upload a file with one employee per row and the same 13 columns as the form above "
+            "(`age`, `workclass`, `fnlwgt`, `educational-num`, `marital-status`, `occupation`, "
+            "`relationship`, `race`, `gender`, `capital-gain`, `capital-loss`, `hours-per-week`, "
+            "`native-country`). Rows are scored in chunks, so large files are fine."
+        )
+        uploaded_file = st.file_uploader("Employee records", type=["csv", "parquet"], key="batch_upload")
+        if uploaded_file is not None and st.button("Score File", key="batch_button"):
+            progress_bar = st.progress(0.0, text="Scoring...")
+
+            def report_progress(rows_done, fraction_done):
+                progress_bar.progress(fraction_done or 0.0, text=f"Scored {rows_done:,} rows...")
+
+            output_path = os.path.join(batch_output_dir(), f"predictions_{time.time_ns()}.csv")
+            try:
+                summary = score_file(
+                    predictor, uploaded_file, output_path, detect_format(uploaded_file.name),
+                    chunksize=DEFAULT_CHUNK_SIZE, progress=report_progress
+                )
+                progress_bar.progress(1.0, text=f"Scored {summary['rows']:,} rows.")
+                # Only the latest result is offered, so the previous file can go.
+                if "batch_result" in st.session_state:
+                    remove_file(st.session_state["batch_result"][1])
+                st.session_state["batch_result"] = (uploaded_file.name, output_path, summary)
+            except SchemaError as e:
+                progress_bar.empty()
+                st.error(str(e))
+                remove_file(output_path)
+            except Exception as e:
+                progress_bar.empty()
+                st.error(f"An error occurred during batch scoring: {e}")
+                remove_file(output_path)
+
+        if "batch_result" in st.session_state:
+            source_name, result_path, summary = st.session_state["batch_result"]
+            st.write(
+                f"**{source_name}**: {summary['rows']:,} rows scored, "
+                f"{summary['above_50k']:,} predicted >50K, {summary['invalid_rows']:,} skipped "
+                "(missing or non-numeric values)."
+            )
+            if os.path.exists(result_path):
+                with open(result_path, "rb") as f:
+                    st.download_button(
+                        "Download Predictions", f,
+                        file_name=f"{os.path.splitext(source_name)[0]}_predictions.csv",
+                        mime="text/csv", key="batch_download"
+                    )
+
+
+batch_panel()
 
 st.markdown("---")
 
-st.markdown(f"""
-<div class="footer">
-    <p>Developed by Sanjeevan Negi | Powered by Edunet and IBM</p>
-    <div class="social-icons">
-        <a href="https://github.com/Sanjeevan910" target="_blank" class="social-icon-link">
-            <svg class="social-icon-svg" viewBox="0 0 24 24">
-                <path d="M12 0c-6.626 0-12 5.373-12 12 0 5.302 3.438 9.8 8.207 11.387.599.111.793-.261.793-.577v-2.234c-3.338.726-4.033-1.416-4.033-1.416-.546-1.387-1.333-1.756-1.333-1.756-1.087-.731.084-.716.084-.716 1.205.082 1.839 1.235 1.839 1.235 1.07 1.835 2.809 1.305 3.492.998.108-.776.418-1.305.762-1.604-2.665-.305-5.467-1.334-5.467-5.931 0-1.311.469-2.381 1.236-3.221-.124-.303-.535-1.524.117-3.176 0 0 1.008-.322 3.301 1.23.957-.266 1.983-.399 3.003-.404 1.02.005 2.047.138 3.006.404 2.291-1.552 3.297-1.23 3.297-1.23.653 1.653.242 2.874.118 3.176.77.84 1.235 1.911 1.235 3.221 0 4.609-2.807 5.624-5.479 5.921.43.372.823 1.102.823 2.222v3.293c0 .319.192.602.802.573 4.765-1.589 8.199-6.086 8.199-11.386 0-6.627-5.373-12-12-12z"/>
-            </svg>
-        </a>
-        <a href="https://www.linkedin.com/in/sanjeevan-negi-5b7a09270" target="_blank" class="social-icon-link">
-            <svg class="social-icon-svg" viewBox="0 0 24 24">
-                <path d="M19 0h-14c-2.761 0-5 2.239-5 5v14c0 2.761 2.239 5 5 5h14c2.762 0 5-2.239 5-5v-14c0-2.761-2.238-5-5-5zm-11 19h-3v-11h3v11zm-1.5-12.268c-.966 0-1.75-.79-1.75-1.764s.784-1.764 1.75-1.764 1.75.79 1.75 1.764-.783 1.764-1.75 1.764zm13.5 12.268h-3v-5.604c0-3.368-4-3.113-4 0v5.604h-3v-11h3v1.765c1.396-2.586 7-2.777 7 2.476v6.759z"/>
-            </svg>
-        </a>
-        <a href="https://www.instagram.com/sanjeevannegz" target="_blank" class="social-icon-link">
-            <svg class="social-icon-svg" viewBox="0 0 24 24">
-                <path d="M12 2.163c3.204 0 3.584.012 4.85.07 3.252.148 4.664 1.407 4.887 4.634.062 1.305.07 1.64.07 4.85v.003c0 3.21.008 3.545-.062 4.85-.148 3.227-1.559 4.486-4.887 4.634-1.266.058-1.64.07-4.85.07s-3.585-.012-4.85-.07c-3.252-.148-4.664-1.407-4.887-4.634-.062-1.305-.07-1.64-.07-4.85v-.003c0-3.21-.008-3.545.062-4.85.148-3.227 1.559-4.486 4.887-4.634 1.266-.058 1.64-.07 4.85-.07zm0-2.163c-3.259 0-3.667.014-4.947.072-4.358.2-6.78 2.618-6.995 6.995-.058 1.281-.072 1.689-.072 4.947 0 3.259.014 3.668.072 4.948.2 4.358 2.618 6.78 6.995 6.995 1.28.058 1.689.072 4.947.072s3.668-.014 4.948-.072c4.354-.2 6.782-2.618 6.995-6.995.058-1.28.072-1.689.072-4.948 0-3.259-.014-3.667-.072-4.947-.2-4.358-2.618-6.78-6.995-6.995-1.281-.058-1.689-.072-4.947-.072zM12 7.038c-2.748 0-4.962 2.214-4.962 4.962s2.214 4.962 4.962 4.962 4.962-2.214 4.962-4.962c0-2.748-2.214-4.962-4.962-4.962zm0 8.162c-1.764 0-3.2-1.436-3.2-3.2s1.436-3.2 3.2-3.2 3.2 1.436 3.2 3.2-1.436 3.2-3.2 3.2zm6.406-11.845c-.796 0-1.441.645-1.441 1.44s.645 1.44 1.441 1.44c.795 0 1.44-.645 1.44-1.44s-.645-1.44-1.44-1.44z"/>
-            </svg>
-        </a>
-    </div>
-</div>
-""", unsafe_allow_html=True)
+render_footer()
@@ -0,0 +1,246 @@
+import streamlit as st
+import base64
+import hashlib
+import html
+import os
+import re
+import shutil
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+BASE_DIR = os.path.dirname(__file__)
+CSS_PATH = os.path.join(BASE_DIR, "style.css")
+JS_PATH = os.path.join(BASE_DIR, "script.js")
+IMG_PATH = os.path.join(BASE_DIR, "background.jpeg")
+
+# Streamlit serves files from ./static at /app/static when
+# server.enableStaticServing is on (see .streamlit/config.toml).
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL = "/app/static"
+
+# Widths of the resized background variants. The browser picks one with
+# the media queries below, so phones never download the 6K original.
+BACKGROUND_WIDTHS = (960, 1600, 2560)
+BACKGROUND_QUALITY = 80
+
+# Slides are shown in the centered layout's ~704 px column. 480 covers
+# phones; the browser picks from srcset for the screen's pixel density.
+SLIDE_WIDTHS = (480, 720)
+SLIDE_QUALITY = 82
+SLIDE_SIZES = "(max-width: 740px) 100vw, 704px"
+
+
+def load_text(file_name):
+    try:
+        with open(file_name, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def static_serving_enabled():
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def build_background_variants(image_path, widths=BACKGROUND_WIDTHS, quality=BACKGROUND_QUALITY):
+    """Write resized JPEG and WebP copies of ``image_path`` into STATIC_DIR.
+
+    File names carry a digest of the source so a new background gets new
+    URLs and browsers can keep caching the old ones. Returns a list of
+    ``(width, jpeg_name, webp_name)`` tuples, smallest first.
+    """
+    with open(image_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    variants = []
+    with Image.open(image_path) as source:
+        source = source.convert("RGB")
+        for width in sorted(widths):
+            width = min(width, source.width)
+            height = round(source.height * width / source.width)
+            jpeg_name = f"background-{width}-{digest}.jpg"
+            webp_name = f"background-{width}-{digest}.webp"
+            jpeg_path = os.path.join(STATIC_DIR, jpeg_name)
+            webp_path = os.path.join(STATIC_DIR, webp_name)
+            if not (os.path.exists(jpeg_path) and os.path.exists(webp_path)):
+                resized = source.resize((width, height), Image.LANCZOS)
+                resized.save(jpeg_path, "JPEG", quality=quality, optimize=True, progressive=True)
+                resized.save(webp_path, "WEBP", quality=quality, method=6)
+            variants.append((width, jpeg_name, webp_name))
+            if width == source.width:
+                break
+    return variants
+
+
+def build_slide_variants(image_path, widths=SLIDE_WIDTHS, quality=SLIDE_QUALITY):
+    """Write resized WebP copies of ``image_path``, plus the original, into STATIC_DIR.
+
+    Returns ``(width, height, [(width, webp_name), ...], full_name)``.
+    """
+    with open(image_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    stem, extension = os.path.splitext(os.path.basename(image_path))
+    prefix = "slide-" + re.sub(r"[^a-z0-9]+", "-", stem.lower()).strip("-")
+
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    full_name = f"{prefix}-full-{digest}{extension.lower()}"
+    full_path = os.path.join(STATIC_DIR, full_name)
+    if not os.path.exists(full_path):
+        shutil.copyfile(image_path, full_path)
+
+    variants = []
+    with Image.open(image_path) as source:
+        size = source.size
+        source = source.convert("RGBA")
+        for width in sorted(widths):
+            width = min(width, source.width)
+            name = f"{prefix}-{width}-{digest}.webp"
+            path = os.path.join(STATIC_DIR, name)
+            if not os.path.exists(path):
+                height = round(source.height * width / source.width)
+                source.resize((width, height), Image.LANCZOS).save(path, "WEBP", quality=quality, method=6)
+            variants.append((width, name))
+            if width == source.width:
+                break
+    return size[0], size[1], variants, full_name
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_slide_html(image_path, caption, eager, mtime):
+    # mtime is only a cache key, so replacing a slide rebuilds its variants.
+    # Returns None when the variants cannot be served.
+    if Image is None or not static_serving_enabled():
+        return None
+    try:
+        width, height, variants, full_name = build_slide_variants(image_path)
+    except OSError:
+        return None
+    full_url = f"{STATIC_URL}/{full_name}"
+    srcset = ", ".join(f"{STATIC_URL}/{name} {w}w" for w, name in variants)
+    caption = html.escape(caption)
+    return f"""
+    <figure class="slide-figure">
+        <a href="{full_url}" target="_blank" title="Open full resolution">
+            <picture>
+                <source type="image/webp" srcset="{srcset}" sizes="{SLIDE_SIZES}">
+                <img src="{full_url}" width="{width}" height="{height}" alt="{caption}"
+                     loading="{'eager' if eager else 'lazy'}" decoding="async">
+            </picture>
+        </a>
+        <figcaption>{caption} &middot; <a href="{full_url}" target="_blank">full resolution</a></figcaption>
+    </figure>
+    """
+
+
+def render_slide(image_path, caption, eager=False):
+    """Show a slide as a lazily loaded, resized image linking to the original.
+
+    Falls back to ``st.image`` without Pillow or static serving. Either
+    way a missing file raises, like ``st.image`` does.
+    """
+    mtime = file_mtime(image_path)
+    slide_html = get_slide_html(image_path, caption, eager, mtime) if mtime is not None else None
+    if slide_html is None:
+        st.image(image_path, caption=caption, use_column_width=True)
+    else:
+        st.markdown(slide_html, unsafe_allow_html=True)
+
+
+def background_rule(jpeg_url, webp_url):
+    return f"""
+        background-image: url("{jpeg_url}");
+        background-image: image-set(url("{webp_url}") type("image/webp"), url("{jpeg_url}") type("image/jpeg"));
+    """
+
+
+def background_css(variants):
+    smallest = variants[0]
+    rules = [f"""
+    .stApp {{
+        {background_rule(f"{STATIC_URL}/{smallest[1]}", f"{STATIC_URL}/{smallest[2]}")}
+        background-size: cover;
+        background-position: center;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+    }}
+    """]
+    # Each larger variant takes over once the viewport is wider than the
+    # previous one.
+    for (previous_width, _, _), (_, jpeg_name, webp_name) in zip(variants, variants[1:]):
+        rules.append(f"""
+    @media (min-width: {previous_width + 1}px) {{
+        .stApp {{
+            {background_rule(f"{STATIC_URL}/{jpeg_name}", f"{STATIC_URL}/{webp_name}")}
+        }}
+    }}
+    """)
+    return "".join(rules)
+
+
+def inline_background_css(image_path):
+    with open(image_path, "rb") as img_file:
+        img_b64 = base64.b64encode(img_file.read()).decode()
+    return f"""
+    .stApp {{
+        background-image: url("data:image/jpeg;base64,{img_b64}");
+        background-size: cover;
+        background-position: center;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+    }}
+    """
+
+
+@st.cache_resource(show_spinner=False)
+def get_page_style(img_mtime, css_mtime, js_mtime):
+    # The mtimes are only cache keys: editing style.css or swapping the
+    # background rebuilds the block, everything else reuses it.
+    bg_css = ""
+    if img_mtime is not None:
+        if Image is not None and static_serving_enabled():
+            try:
+                bg_css = background_css(build_background_variants(IMG_PATH))
+            except OSError:
+                bg_css = ""
+        if not bg_css:
+            bg_css = inline_background_css(IMG_PATH)
+
+    return f"""
+    <style>
+    {bg_css}
+    {load_text(CSS_PATH)}
+    </style>
+    <script type="text/javascript">
+    {load_text(JS_PATH)}
+    </script>
+    """, bool(bg_css)
+
+
+def apply_page_style(missing_background_css="", missing_background_message=None):
+    page_style, has_background = get_page_style(
+        file_mtime(IMG_PATH), file_mtime(CSS_PATH), file_mtime(JS_PATH)
+    )
+    if not has_background:
+        if missing_background_message:
+            st.warning(missing_background_message)
+        page_style = f"<style>{missing_background_css}</style>{page_style}"
+
+    if hasattr(st, 'html'):
+        st.html(page_style)
+    else:
+        st.markdown(page_style, unsafe_allow_html=True)
+    return has_background
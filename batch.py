@@ -0,0 +1,219 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, NUMERIC_COLUMNS, SALARY_LABELS, missing_columns
+
+# Rows per model call. Memory use is bounded by this, not by file size.
+DEFAULT_CHUNK_SIZE = 50_000
+
+PREDICTION_COLUMN = "prediction"
+PROBABILITY_COLUMN = "probability_>50K"
+LABEL_COLUMN = "salary_range"
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def detect_format(file_name):
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".csv":
+        return "csv"
+    raise SchemaError(f"Unsupported file type '{ext}'. Please upload a CSV or Parquet file.")
+
+
+def read_columns(source, fmt):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        columns = pq.ParquetFile(source).schema_arrow.names
+    else:
+        columns = list(pd.read_csv(source, nrows=0, skipinitialspace=True).columns)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return [c.strip() for c in columns]
+
+
+def validate_columns(source, fmt):
+    missing = missing_columns(read_columns(source, fmt))
+    if missing:
+        raise SchemaError(
+            f"Missing required column(s): {', '.join(missing)}. "
+            f"Expected: {', '.join(FEATURE_COLUMNS)}."
+        )
+
+
+def iter_chunks(source, fmt, chunksize=DEFAULT_CHUNK_SIZE):
+    """Yield ``(chunk, fraction_done)`` pairs without loading the whole file."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        total = max(parquet_file.metadata.num_rows, 1)
+        done = 0
+        for record_batch in parquet_file.iter_batches(batch_size=chunksize):
+            chunk = record_batch.to_pandas()
+            done += len(chunk)
+            yield chunk, done / total
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from iter_csv_chunks(f, chunksize)
+    else:
+        yield from iter_csv_chunks(source, chunksize)
+
+
+def iter_csv_chunks(buffer, chunksize):
+    # Progress is the share of bytes the CSV parser has consumed so far.
+    buffer.seek(0, os.SEEK_END)
+    total = buffer.tell()
+    buffer.seek(0)
+    dtype = {c: str for c in CATEGORICAL_COLUMNS}
+    with pd.read_csv(buffer, chunksize=chunksize, dtype=dtype, skipinitialspace=True) as reader:
+        for chunk in reader:
+            yield chunk, min(buffer.tell() / total, 1.0) if total else None
+
+
+def prepare_features(chunk):
+    """Return the pipeline's 13 input columns and a mask of usable rows.
+
+    Numeric fields that are missing or not numbers make a row invalid; it
+    is passed through to the output without a prediction instead of
+    failing the whole file.
+    """
+    chunk.columns = [str(c).strip() for c in chunk.columns]
+    features = pd.DataFrame(index=chunk.index)
+    for column in FEATURE_COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            features[column] = pd.to_numeric(chunk[column], errors="coerce")
+        else:
+            features[column] = chunk[column].astype(str).str.strip()
+    valid = features[NUMERIC_COLUMNS].notna().all(axis=1).to_numpy()
+    return features, valid
+
+
+def score_chunk(predictor, chunk):
+    features, valid = prepare_features(chunk)
+    predictions = np.full(len(chunk), np.nan)
+    probabilities = np.full(len(chunk), np.nan)
+    if valid.any():
+        predictions[valid], probabilities[valid] = predictor.predict_frame(features[valid])
+
+    scored = chunk.copy()
+    scored[PREDICTION_COLUMN] = pd.Series(predictions, index=chunk.index).astype("Int64")
+    scored[PROBABILITY_COLUMN] = probabilities
+    scored[LABEL_COLUMN] = scored[PREDICTION_COLUMN].map(SALARY_LABELS)
+    return scored
+
+
+def parquet_schema(scored):
+    """Arrow schema for every scored chunk, fixed by column role rather than by the first chunk's values.
+
+    The prediction is int64 and the probability float64. The model's
+    numeric inputs, and other columns with numbers in the first chunk, are
+    float64, so a chunk of integers and one with missing values agree.
+    Everything else is a string, so an all-missing first chunk cannot pin
+    a column to null.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for column, values in scored.items():
+        if column == PREDICTION_COLUMN:
+            arrow_type = pa.int64()
+        elif column in NUMERIC_COLUMNS or column == PROBABILITY_COLUMN or (
+            pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) and values.notna().any()
+        ):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def conform_to_schema(scored, schema):
+    """A copy of ``scored`` whose columns convert to ``schema`` without loss."""
+    import pyarrow as pa
+
+    scored = scored.copy()
+    for field in schema:
+        column = scored[field.name]
+        if field.type == pa.string():
+            scored[field.name] = column.astype("string")
+        elif not pd.api.types.is_numeric_dtype(column):
+            if field.name not in NUMERIC_COLUMNS:
+                raise SchemaError(
+                    f"Column '{field.name}' holds text in a later chunk but numbers in the first one. "
+                    "Write the results as CSV instead."
+                )
+            # Non-numeric model inputs already make the row invalid.
+            scored[field.name] = pd.to_numeric(column, errors="coerce")
+    return scored
+
+
+class ResultWriter:
+    """Append scored chunks to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        self._parquet_writer = None
+        self._schema = None
+        self._wrote_header = False
+
+    def write(self, scored):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                self._schema = parquet_schema(scored)
+                self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+            table = pa.Table.from_pandas(conform_to_schema(scored, self._schema), schema=self._schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            scored.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                          header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def new_summary():
+    return {"rows": 0, "invalid_rows": 0, "above_50k": 0}
+
+
+def add_to_summary(summary, scored):
+    summary["rows"] += len(scored)
+    summary["invalid_rows"] += int(scored[PREDICTION_COLUMN].isna().sum())
+    summary["above_50k"] += int((scored[PREDICTION_COLUMN] == 1).sum())
+
+
+def score_file(predictor, source, output_path, fmt, chunksize=DEFAULT_CHUNK_SIZE, progress=None):
+    """Score ``source`` chunk by chunk into ``output_path``.
+
+    ``progress`` is called with ``(rows_done, fraction_done)`` after every
+    chunk; ``fraction_done`` is None when the size of the input is unknown.
+    Returns a summary dict of row counts.
+    """
+    validate_columns(source, fmt)
+    summary = new_summary()
+    with ResultWriter(output_path) as writer:
+        for chunk, fraction in iter_chunks(source, fmt, chunksize):
+            scored = score_chunk(predictor, chunk)
+            writer.write(scored)
+            add_to_summary(summary, scored)
+            if progress is not None:
+                progress(summary["rows"], fraction)
+    return summary
@@ -0,0 +1,263 @@
+"""Offline performance benchmarks for the salary predictor.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --baseline bench.json
+    python benchmark.py --large --skip-pages
+
+Measures:
+- model load time and memory;
+- single-row latency percentiles for ``pipeline.predict`` and for the
+  Predictor fast path;
+- the one-row ``pd.DataFrame([...])`` construction app.py used to do;
+- batch throughput at 1 / 100 / 10k rows, and with ``--large`` at 1M rows
+  scored in ``batch.DEFAULT_CHUNK_SIZE`` chunks the way score_batch.py
+  does, with the peak RSS it added;
+- the bytes each Streamlit page emits per full rerun.
+
+Everything runs locally with no browser or server. Results are written
+as JSON, and ``--baseline`` prints the relative change of every number
+against an earlier run to stderr.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+PAGES = ["app.py", os.path.join("pages", "Attribute_Explanation.py"), os.path.join("pages", "Model_Explanation.py")]
+BATCH_SIZES = [1, 100, 10_000]
+LARGE_BATCH_ROWS = 1_000_000
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(samples_s):
+    samples_us = np.asarray(samples_s) * 1e6
+    return {
+        "mean_us": float(samples_us.mean()),
+        "p50_us": float(np.percentile(samples_us, 50)),
+        "p90_us": float(np.percentile(samples_us, 90)),
+        "p99_us": float(np.percentile(samples_us, 99)),
+        "n": len(samples_us),
+    }
+
+
+def time_calls(fn, repeat, warmup=5):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def bench_load(model_path):
+    import joblib
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    pipeline = joblib.load(model_path)
+    load_seconds = time.perf_counter() - start
+    rss_after_load = current_rss_mb()
+
+    from inference import Predictor
+    start = time.perf_counter()
+    predictor = Predictor.from_pipeline(pipeline)
+    predictor_seconds = time.perf_counter() - start
+    return pipeline, predictor, {
+        "joblib_load_seconds": load_seconds,
+        "joblib_load_rss_delta_mb": rss_after_load - rss_before,
+        "predictor_build_seconds": predictor_seconds,
+        "predictor_build_rss_delta_mb": current_rss_mb() - rss_after_load,
+        "model_file_bytes": os.path.getsize(model_path),
+    }
+
+
+def bench_single_row(pipeline, predictor, record, repeat):
+    import pandas as pd
+
+    from schema import FEATURE_COLUMNS
+
+    frame = pd.DataFrame([record], columns=FEATURE_COLUMNS)
+    return {
+        "dataframe_construction": time_calls(lambda: pd.DataFrame([record]), repeat),
+        "pipeline_predict": time_calls(lambda: pipeline.predict(pd.DataFrame([record])), repeat),
+        "pipeline_predict_prebuilt_frame": time_calls(lambda: pipeline.predict(frame), repeat),
+        "predictor_predict_record": time_calls(lambda: predictor._predict_record(record), repeat),
+    }
+
+
+def bench_batches(pipeline, predictor, sizes, seconds_budget):
+    from schema import sample_profiles
+
+    results = {}
+    for n in sizes:
+        frame = sample_profiles(n, seed=n)
+        entry = {}
+        for name, fn in (
+            ("pipeline_predict_proba", lambda: pipeline.predict_proba(frame)),
+            ("predictor_predict_frame", lambda: predictor.predict_frame(frame)),
+        ):
+            runs = []
+            deadline = time.perf_counter() + seconds_budget
+            while not runs or (time.perf_counter() < deadline and len(runs) < 20):
+                start = time.perf_counter()
+                fn()
+                runs.append(time.perf_counter() - start)
+            best = min(runs)
+            entry[name] = {"best_seconds": best, "rows_per_second": n / best, "runs": len(runs)}
+        results[str(n)] = entry
+    return results
+
+
+def peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_large_batch(predictor, rows, chunksize):
+    """Generate and score ``rows`` profiles chunk by chunk through batch.score_chunk."""
+    from batch import score_chunk
+    from schema import sample_profiles
+
+    peak_before = peak_rss_mb()
+    rss_before = current_rss_mb()
+    seconds = 0.0
+    for i, start in enumerate(range(0, rows, chunksize)):
+        chunk = sample_profiles(min(chunksize, rows - start), seed=i)
+        begin = time.perf_counter()
+        score_chunk(predictor, chunk)
+        seconds += time.perf_counter() - begin
+    return {
+        "rows": rows,
+        "chunksize": chunksize,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds,
+        # ru_maxrss is the process peak, so this is only an upper bound
+        # when an earlier step peaked higher.
+        "peak_rss_delta_mb": max(peak_rss_mb() - max(peak_before, rss_before), 0.0),
+    }
+
+
+def element_bytes(node):
+    # Leaf elements carry a proto; blocks only group their children.
+    children = getattr(node, "children", None)
+    if children:
+        return sum(element_bytes(child) for child in children.values())
+    proto = getattr(node, "proto", None)
+    return len(proto.SerializeToString()) if proto is not None else 0
+
+
+def bench_pages(pages):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for page in pages:
+        at = AppTest.from_file(os.path.join(BASE_DIR, page), default_timeout=120)
+        at.run()
+        start = time.perf_counter()
+        at.run()
+        rerun_seconds = time.perf_counter() - start
+        results[page] = {
+            "bytes_per_rerun": element_bytes(at._tree),
+            "rerun_seconds": rerun_seconds,
+            "exception": [str(e.value) for e in at.exception],
+        }
+    return results
+
+
+def flatten(d, prefix=""):
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, name + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def print_comparison(current, baseline):
+    old = dict(flatten(baseline.get("results", {})))
+    for name, value in flatten(current["results"]):
+        if name in old and old[name]:
+            change = (value - old[name]) / abs(old[name]) * 100
+            # stderr, so stdout stays parseable JSON when there is no --output.
+            print(f"{name:<75} {old[name]:>14.4g} -> {value:>14.4g}  ({change:+.1f}%)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model loading, inference and page payloads.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against (printed to stderr)")
+    parser.add_argument("--repeat", type=int, default=500, help="single-row repetitions (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="use fewer repetitions")
+    parser.add_argument("--large", action="store_true",
+                        help=f"also score {LARGE_BATCH_ROWS:,} rows in chunks (about a minute)")
+    parser.add_argument("--skip-pages", action="store_true", help="do not run the Streamlit pages")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    import sklearn
+
+    from batch import DEFAULT_CHUNK_SIZE
+    from prediction_cache import file_sha256
+    from schema import sample_profiles
+
+    repeat = min(args.repeat, 100) if args.quick else args.repeat
+
+    pipeline, predictor, load = bench_load(args.model)
+    record = {k: (v.item() if hasattr(v, "item") else v) for k, v in sample_profiles(1).to_dict("records")[0].items()}
+    results = {
+        "load": load,
+        "single_row": bench_single_row(pipeline, predictor, record, repeat),
+        "batch": bench_batches(pipeline, predictor, BATCH_SIZES, seconds_budget=2.0),
+    }
+    if args.large:
+        results["large_batch"] = bench_large_batch(predictor, LARGE_BATCH_ROWS, DEFAULT_CHUNK_SIZE)
+    if not args.skip_pages:
+        results["pages"] = bench_pages(PAGES)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "model": os.path.basename(args.model),
+            "model_sha256": file_sha256(args.model),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "quick": args.quick,
+            "large": args.large,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Cascaded early-exit scoring for batch jobs.
+
+    python cascade.py --trees 100 --target-disagreement 0.001
+    python cascade.py --data employees.csv --trees 30 --thresholds 0.5 0.8 0.9
+
+The first stage is the compiled model cut down to its first ``--trees``
+trees. For gradient boosting these are the first boosting stages; forests
+and voting members are cut the same way. Rows where the first stage is
+confident answer directly. The rest are re-scored by the full model.
+Confidence is ``|2 p - 1|``: it is 0 on the decision boundary and 1 for a
+certain answer.
+
+The report shows, for each confidence threshold, how many rows escalate
+and how often the cascade's label differs from the full model's. With
+``--target-disagreement``, it picks the lowest threshold that stays within
+that rate on the given rows and times both models on them. Without
+``--data``, rows are sampled uniformly from the form's ranges. That
+is not the real population, so tune on real data before relying on the
+threshold.
+
+For a GradientBoostingClassifier pipeline, both stages run through
+sklearn's own stage loop on slices of ``estimators_``
+(``BoostingStages``). The NumPy evaluator is slower than sklearn on
+large batches, so a cascade built on it loses to the plain classifier.
+The timing compares the cascade with the plain sklearn classifier, or
+with the compiled model for artifacts loaded without sklearn.
+
+``score_batch.py --cascade-trees N --cascade-threshold T`` uses the
+cascade for file scoring of gradient boosting models. Early-exit rows
+report the first stage's probability.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from inference import Predictor, load_predictor
+from metrics import METRICS
+from tree_engine import GradientBoostingMember, as_float32
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+
+DEFAULT_STAGE_TREES = 100
+DEFAULT_THRESHOLDS = (0.0, 0.2, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+
+
+class BoostingStages:
+    """Stages ``start:stop`` of a fitted sklearn GradientBoostingClassifier, summed by sklearn.
+
+    ``member`` is the model compiled by tree_engine; its prior and
+    ``decide`` are bit-identical to sklearn's.
+    """
+
+    def __init__(self, model, member, start=0, stop=None):
+        self.model = model
+        self.member = member
+        self.estimators = model.estimators_[start:stop]
+
+    def raw_predict(self, X, start=None):
+        from sklearn.ensemble._gradient_boosting import predict_stages
+
+        raw = np.empty((X.shape[0], 1))
+        raw[:, 0] = self.member.init_raw if start is None else start
+        # Adds learning_rate * leaf value tree by tree into ``raw``, as
+        # GradientBoostingClassifier.decision_function does.
+        predict_stages(self.estimators, X, self.model.learning_rate, raw)
+        return raw[:, 0]
+
+    def decide(self, raw):
+        return self.member.decide(raw)
+
+
+def sklearn_booster(predictor):
+    """The predictor's sklearn GradientBoostingClassifier, or None."""
+    from tree_engine import GradientBoostingMember
+
+    if predictor.pipeline is None or not isinstance(predictor.classifier, GradientBoostingMember):
+        return None
+    return predictor.pipeline.steps[-1][1]
+
+
+def confidence(proba):
+    """``|2 p - 1|`` of a binary probability matrix."""
+    return np.abs(proba[:, 1] - proba[:, 0])
+
+
+class CascadeModel:
+    """Truncated first stage with escalation of uncertain rows to ``full``."""
+
+    def __init__(self, full, n_trees=DEFAULT_STAGE_TREES, threshold=0.9, booster=None):
+        if getattr(full, "voting", "soft") == "hard":
+            raise ValueError("A cascade needs probabilities, which hard voting does not give.")
+        if n_trees < 1:
+            raise ValueError("The first stage needs at least one tree.")
+        self.full = full
+        self.first = full.truncated(n_trees)
+        # Boosting can resume escalated rows from the first stage's sum
+        # instead of scoring them from the prior again.
+        self.rest = None
+        if isinstance(full, GradientBoostingMember) and n_trees < full.trees.n_trees:
+            if booster is not None:
+                self.first = BoostingStages(booster, full, 0, n_trees)
+                self.rest = BoostingStages(booster, full, n_trees)
+            else:
+                self.rest = full.remainder(n_trees)
+        self.n_trees = n_trees
+        self.threshold = threshold
+        self.classes_ = full.classes_
+        self.rows = 0
+        self.escalated = 0
+
+    def predict_and_proba(self, X):
+        with METRICS.stage("cascade.first"):
+            if self.rest is not None:
+                raw = self.first.raw_predict(X)
+                predictions, proba = self.first.decide(raw)
+            else:
+                predictions, proba = self.first.predict_and_proba(X)
+        uncertain = confidence(proba) < self.threshold
+        n_uncertain = int(uncertain.sum())
+        if n_uncertain:
+            with METRICS.stage("cascade.full"):
+                if self.rest is not None:
+                    full_predictions, full_proba = self.full.decide(self.rest.raw_predict(X[uncertain], raw[uncertain]))
+                else:
+                    full_predictions, full_proba = self.full.predict_and_proba(X[uncertain])
+            predictions[uncertain] = full_predictions
+            proba[uncertain] = full_proba
+        self.rows += len(X)
+        self.escalated += n_uncertain
+        METRICS.inc("cascade_escalations", n_uncertain)
+        return predictions, proba
+
+    def predict_proba(self, X):
+        return self.predict_and_proba(X)[1]
+
+    def predict(self, X):
+        return self.predict_and_proba(X)[0]
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.rows if self.rows else 0.0
+
+
+def cascade_predictor(predictor, n_trees=DEFAULT_STAGE_TREES, threshold=0.9):
+    """A Predictor that scores through a CascadeModel over ``predictor``'s gradient boosting model."""
+    if not predictor.fast_path or not isinstance(predictor.classifier, GradientBoostingMember):
+        raise ValueError("The cascade only speeds up compiled gradient boosting models.")
+    cascade = CascadeModel(predictor.classifier, n_trees, threshold, booster=sklearn_booster(predictor))
+    # No pipeline, so Predictor never routes large batches past the
+    # cascade, and no model_hash, so cascade results stay out of the
+    # shared prediction cache.
+    return Predictor(None, predictor.encoder, cascade)
+
+
+def agreement_report(full, n_trees, X, thresholds=DEFAULT_THRESHOLDS):
+    """Escalation and disagreement with ``full`` at each threshold, on encoded rows ``X``."""
+    X = as_float32(X)
+    first_predictions, first_proba = full.truncated(n_trees).predict_and_proba(X)
+    full_predictions, full_proba = full.predict_and_proba(X)
+    conf = confidence(first_proba)
+    differs = first_predictions != full_predictions
+    proba_gap = np.abs(first_proba[:, 1] - full_proba[:, 1])
+    rows = []
+    for threshold in thresholds:
+        exits = conf >= threshold
+        rows.append({
+            "threshold": float(threshold),
+            "escalation_rate": float(1 - exits.mean()),
+            "disagreement_rate": float((exits & differs).mean()),
+            "max_probability_gap": float(proba_gap[exits].max()) if exits.any() else 0.0,
+        })
+    return rows
+
+
+def tune_threshold(full, n_trees, X, target_disagreement):
+    """Lowest threshold whose disagreement with ``full`` on ``X`` is at most the target."""
+    X = as_float32(X)
+    first_predictions, first_proba = full.truncated(n_trees).predict_and_proba(X)
+    full_predictions = full.predict_and_proba(X)[0]
+    # Confidences of the rows the first stage gets wrong, highest first. Up to
+    # `allowed` of them may exit; the threshold must sit just above the next.
+    wrong = np.sort(confidence(first_proba)[first_predictions != full_predictions])[::-1]
+    allowed = int(target_disagreement * len(X))
+    if allowed >= len(wrong):
+        return 0.0
+    return float(np.nextafter(wrong[allowed], np.inf))
+
+
+def best_seconds(fn, repeat=3):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+
+def load_rows(path, limit):
+    from batch import detect_format, prepare_features
+    import pandas as pd
+
+    frame = pd.read_parquet(path) if detect_format(path) == "parquet" else pd.read_csv(path, skipinitialspace=True)
+    features, valid = prepare_features(frame)
+    return features[valid].head(limit).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune and evaluate cascaded early-exit scoring.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pipeline pickle or model artifact directory")
+    parser.add_argument("--data", help="CSV or Parquet rows to tune on (default: sampled profiles)")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows to use (default: %(default)s)")
+    parser.add_argument("--trees", type=int, default=DEFAULT_STAGE_TREES,
+                        help="trees in the first stage (default: %(default)s)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--target-disagreement", type=float, default=0.001,
+                        help="largest acceptable share of rows whose label changes (default: %(default)s)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    from schema import sample_profiles
+
+    predictor = load_predictor(args.model)
+    if not predictor.fast_path:
+        parser.error("this model cannot be compiled, so it has no cascade")
+    frame = load_rows(args.data, args.rows) if args.data else sample_profiles(args.rows, seed=1)
+    X = as_float32(predictor.encoder.encode_frame(frame))
+    full = predictor.classifier
+
+    report = agreement_report(full, args.trees, X, args.thresholds)
+    print(f"first stage: first {args.trees} trees of each model, {len(X):,} rows")
+    print(f"{'threshold':>10} {'escalated':>10} {'disagree':>10} {'max |dp|':>10}")
+    for row in report:
+        print(f"{row['threshold']:>10.3f} {row['escalation_rate']:>10.2%} "
+              f"{row['disagreement_rate']:>10.4%} {row['max_probability_gap']:>10.3f}")
+
+    threshold = tune_threshold(full, args.trees, X, args.target_disagreement)
+    booster = sklearn_booster(predictor)
+    cascade = CascadeModel(full, args.trees, threshold, booster=booster)
+    # Baseline: the fastest way to score without the cascade.
+    if predictor.pipeline is not None:
+        baseline_name = "sklearn classifier"
+        classifier = predictor.pipeline.steps[-1][1]
+        baseline_seconds = best_seconds(lambda: classifier.predict_proba(X))
+    else:
+        baseline_name = "compiled model"
+        baseline_seconds = best_seconds(lambda: full.predict_and_proba(X))
+    cascade.rows = cascade.escalated = 0
+    cascade_seconds = best_seconds(lambda: cascade.predict_and_proba(X))
+    agreement = float(np.mean(cascade.predict(X) == full.predict_and_proba(X)[0]))
+    tuned = {
+        "trees": args.trees,
+        "threshold": threshold,
+        "target_disagreement": args.target_disagreement,
+        "agreement": agreement,
+        "escalation_rate": cascade.escalation_rate,
+        "stages": "sklearn" if booster is not None else "compiled",
+        "baseline": baseline_name,
+        "baseline_rows_per_second": len(X) / baseline_seconds,
+        "cascade_rows_per_second": len(X) / cascade_seconds,
+        "speedup": baseline_seconds / cascade_seconds,
+    }
+    print(f"\ntuned threshold {threshold:.4f}: {tuned['escalation_rate']:.1%} escalated, "
+          f"agreement {agreement:.4%}, {baseline_name} {tuned['baseline_rows_per_second']:,.0f} -> "
+          f"cascade {tuned['cascade_rows_per_second']:,.0f} rows/s ({tuned['speedup']:.2f}x)")
+    if tuned["speedup"] <= 1:
+        print("the cascade is not faster than the plain model here; do not use --cascade-trees")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"report": report, "tuned": tuned, "rows": len(X), "data": args.data}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
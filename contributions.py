@@ -0,0 +1,199 @@
+"""Per-prediction feature contributions from tree paths.
+
+Uses the Saabas method: each split on a row's path through a tree moves
+the node value from parent to child. That change is credited to the split
+feature. Summed over every tree, the contributions plus the bias give the
+model output exactly.
+
+Node values are recomputed bottom-up as the ``weighted_n_node_samples``
+weighted mean of the children. Gradient boosting only updates its leaves
+with the final Newton step, so the stored values of internal nodes are not
+consistent with the leaves.
+
+Contributions are in log-odds for gradient boosting. For forests and
+voting ensembles they are in P(>50K). A boosting member of a vote is
+rescaled from log-odds to its probability change. The one-hot columns are
+then summed back to the 13 input attributes.
+"""
+import numpy as np
+from scipy.special import expit
+
+from schema import ATTRIBUTE_LABELS
+from tree_engine import TreeArrays, as_float32
+
+# Profiles used to average global importances.
+IMPORTANCE_ROWS = 2000
+
+
+def _node_values(tree, leaf_values):
+    values = np.array(leaf_values(tree), dtype=np.float64)
+    weights = tree.weighted_n_node_samples
+    left, right = tree.children_left, tree.children_right
+    # Children always have larger ids than their parent, so one reverse
+    # pass sees both children before the parent.
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] != -1:
+            l, r = left[node], right[node]
+            values[node] = (weights[l] * values[l] + weights[r] * values[r]) / (weights[l] + weights[r])
+    return values
+
+
+class PathContributions:
+    """Contributions of one tree ensemble: ``bias + scale * sum of node value changes``."""
+
+    def __init__(self, trees, bias, scale, space):
+        self.trees = trees
+        self.bias = bias
+        self.scale = scale
+        # "log-odds" or "probability"
+        self.space = space
+
+    @classmethod
+    def from_trees(cls, trees, leaf_values, offset, scale, space):
+        arrays = TreeArrays.from_trees(trees, lambda tree: _node_values(tree, leaf_values))
+        bias = offset + scale * float(np.sum(arrays.value[arrays.roots]))
+        return cls(arrays, bias, scale, space)
+
+    @classmethod
+    def from_estimator(cls, model):
+        """Contributions of a fitted tree model over its own input matrix.
+
+        ``explain`` takes the matrix the model was fitted on, i.e. the
+        encoded features, so a Pipeline is accepted only without
+        preprocessing steps.
+        """
+        from sklearn.ensemble import GradientBoostingClassifier
+        from sklearn.ensemble._forest import ForestClassifier
+        from sklearn.pipeline import Pipeline
+
+        from tree_engine import GradientBoostingMember
+
+        if isinstance(model, Pipeline):
+            if any(step not in (None, "passthrough") for _, step in model.steps[:-1]):
+                raise ValueError("Cannot explain a Pipeline with preprocessing steps; pass its final estimator.")
+            model = model.steps[-1][1]
+        if isinstance(model, GradientBoostingClassifier):
+            member = GradientBoostingMember.from_estimator(model)
+            return cls.from_trees(
+                [est.tree_ for est in model.estimators_[:, 0]], lambda tree: tree.value[:, 0, 0],
+                offset=member.init_raw, scale=member.learning_rate, space="log-odds",
+            )
+        trees = [est.tree_ for est in model.estimators_] if isinstance(model, ForestClassifier) else [model.tree_]
+        positive = list(model.classes_).index(1)
+        return cls.from_trees(
+            trees, lambda tree: tree.value[:, 0, positive], offset=0.0, scale=1.0 / len(trees), space="probability"
+        )
+
+    def explain(self, X):
+        """Return ``(bias, contributions)`` with contributions of shape (n_rows, n_features)."""
+        trees = self.trees
+        n_rows, n_features = X.shape
+        nodes = np.broadcast_to(trees.roots, (n_rows, trees.n_trees))
+        rows = np.broadcast_to(np.arange(n_rows)[:, np.newaxis], nodes.shape)
+        totals = np.zeros(n_rows * n_features)
+        for _ in range(trees.max_depth):
+            split_feature = trees.feature[nodes]
+            go_left = X[rows, split_feature] <= trees.threshold[nodes]
+            children = np.where(go_left, trees.left[nodes], trees.right[nodes])
+            moved = children != nodes
+            totals += np.bincount(
+                (rows[moved] * n_features + split_feature[moved]),
+                weights=trees.value[children[moved]] - trees.value[nodes[moved]],
+                minlength=n_rows * n_features,
+            )
+            nodes = children
+        return self.bias, self.scale * totals.reshape(n_rows, n_features)
+
+
+class ContributionEngine:
+    """Attribute-level contributions for a fitted pipeline's tree model."""
+
+    def __init__(self, encoder, members, weights, space):
+        # members: PathContributions per ensemble member; weights: their
+        # voting weights (None for a single model).
+        self.encoder = encoder
+        self.members = members
+        self.weights = weights
+        self.space = space
+        attributes = [None] * encoder.n_features
+        for column, index in encoder.numeric:
+            attributes[index] = column
+        for column, lookup in encoder.categorical:
+            for index in lookup.values():
+                attributes[index] = column
+        self.attributes = list(dict.fromkeys(a for a in attributes if a is not None))
+        positions = {a: i for i, a in enumerate(self.attributes)}
+        # Sums one-hot (and numeric) columns into their input attribute.
+        self._to_attributes = np.zeros((encoder.n_features, len(self.attributes)))
+        for index, attribute in enumerate(attributes):
+            if attribute is not None:
+                self._to_attributes[index, positions[attribute]] = 1.0
+
+    @classmethod
+    def from_predictor(cls, predictor):
+        """Raises ValueError unless the predictor has its sklearn pipeline and direct encoder."""
+        from sklearn.ensemble import VotingClassifier
+
+        if predictor.pipeline is None or predictor.encoder is None:
+            raise ValueError("Contributions need the fitted sklearn pipeline and the direct encoder.")
+        model = predictor.pipeline.steps[-1][1]
+        if isinstance(model, VotingClassifier):
+            if model.voting != "soft":
+                raise ValueError("Contributions are only defined for soft voting.")
+            members = [PathContributions.from_estimator(est) for est in model.estimators_]
+            weights = model._weights_not_none or [1.0] * len(members)
+            return cls(predictor.encoder, members, weights, "probability")
+        try:
+            member = PathContributions.from_estimator(model)
+        except AttributeError:
+            raise ValueError(f"Contributions are not available for {type(model).__name__}.")
+        return cls(predictor.encoder, [member], None, member.space)
+
+    def explain_encoded(self, X):
+        """Return ``(bias, contributions)``, contributions per attribute of shape (n_rows, 13)."""
+        X = as_float32(X)
+        if self.weights is None:
+            bias, contributions = self.members[0].explain(X)
+        else:
+            bias, contributions = 0.0, np.zeros(X.shape, dtype=np.float64)
+            total_weight = float(np.sum(self.weights))
+            for member, weight in zip(self.members, self.weights):
+                member_bias, member_contributions = member.explain(X)
+                if member.space == "log-odds":
+                    # Boosting member in log-odds: rescale so it sums to its change in probability.
+                    raw = member_bias + member_contributions.sum(axis=1)
+                    gap = raw - member_bias
+                    ratio = np.divide(expit(raw) - expit(member_bias), gap, out=np.zeros_like(gap), where=gap != 0)
+                    member_bias, member_contributions = expit(member_bias), member_contributions * ratio[:, np.newaxis]
+                bias += weight / total_weight * member_bias
+                contributions += weight / total_weight * member_contributions
+        return bias, contributions @ self._to_attributes
+
+    def explain_record(self, record):
+        """``(bias, {attribute: contribution})`` for one input dict."""
+        bias, contributions = self.explain_encoded(self.encoder.encode(record))
+        return bias, dict(zip(self.attributes, contributions[0].tolist()))
+
+    def global_importances(self, frame):
+        """Mean absolute contribution of each attribute over ``frame``."""
+        _, contributions = self.explain_encoded(self.encoder.encode_frame(frame))
+        return dict(zip(self.attributes, np.abs(contributions).mean(axis=0).tolist()))
+
+
+def contribution_figure(values, xlabel):
+    """Horizontal bar chart of ``{attribute: value}``, largest magnitude at the top."""
+    # A bare Figure keeps pyplot's global state out of concurrent sessions.
+    from matplotlib.figure import Figure
+
+    items = sorted(values.items(), key=lambda item: abs(item[1]))
+    fig = Figure(figsize=(7, 0.32 * len(items) + 1.0))
+    ax = fig.subplots()
+    ax.barh(
+        [ATTRIBUTE_LABELS.get(name, name) for name, _ in items], [value for _, value in items],
+        color=["#2e7d32" if value >= 0 else "#c62828" for _, value in items],
+    )
+    ax.axvline(0, color="black", linewidth=0.8)
+    ax.set_xlabel(xlabel)
+    ax.tick_params(axis="y", labelsize=9)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,213 @@
+"""Smallest changes that move a profile to a >50K prediction.
+
+Only attributes a person can act on are changed: educational years
+(upwards only), hours per week, occupation and workclass. Every
+combination of their values is a candidate. Its cost is the weighted
+size of the change (COSTS). Candidates are scored in cost order, in
+growing batches that each take one model call. Once a candidate flips
+the prediction, every later candidate that makes the same changes and
+more is pruned before it is scored. Such a candidate can never be
+cheaper, and it would only repeat the answer. The search stops after
+``max_solutions`` flips, when the candidates run out, or when the time
+budget is spent.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from schema import ATTRIBUTE_LABELS, CATEGORY_OPTIONS, FEATURE_COLUMNS, NUMERIC_RANGES
+
+ACTIONABLE_ATTRIBUTES = ["educational-num", "hours-per-week", "occupation", "workclass"]
+# Cost of one more year of education, one hour per week more or less, and
+# of a new occupation or workclass.
+COSTS = {"educational-num": 1.0, "hours-per-week": 0.1, "occupation": 2.0, "workclass": 1.0}
+MAX_HOURS = 80
+# Hours change in steps of this size; single hours would multiply the
+# candidates by five for differences nobody acts on.
+HOURS_STEP = 5
+TIME_BUDGET_SECONDS = 1.0
+FIRST_BATCH = 256
+MAX_BATCH = 8192
+
+
+def candidate_values(profile, max_hours=MAX_HOURS):
+    """The values each actionable attribute may take, the profile's own value first."""
+    education = int(profile["educational-num"])
+    hours = int(profile["hours-per-week"])
+    low_hours = NUMERIC_RANGES["hours-per-week"][0]
+    values = {
+        "educational-num": list(range(education, NUMERIC_RANGES["educational-num"][1] + 1)),
+        "hours-per-week": [hours] + [
+            h for h in range(hours % HOURS_STEP or HOURS_STEP, max(max_hours, hours) + 1, HOURS_STEP)
+            if h != hours and h >= low_hours
+        ],
+    }
+    for attribute in ("occupation", "workclass"):
+        values[attribute] = list(dict.fromkeys([profile[attribute]] + CATEGORY_OPTIONS[attribute]))
+    return values
+
+
+def candidate_grid(profile, max_hours=MAX_HOURS):
+    """Index arrays into ``candidate_values`` for every changed combination, cheapest first, and their costs."""
+    values = candidate_values(profile, max_hours)
+    indices = np.meshgrid(*[np.arange(len(values[a])) for a in ACTIONABLE_ATTRIBUTES], indexing="ij")
+    indices = {a: index.ravel() for a, index in zip(ACTIONABLE_ATTRIBUTES, indices)}
+
+    education = np.asarray(values["educational-num"])[indices["educational-num"]]
+    hours = np.asarray(values["hours-per-week"])[indices["hours-per-week"]]
+    cost = (
+        COSTS["educational-num"] * (education - int(profile["educational-num"]))
+        + COSTS["hours-per-week"] * np.abs(hours - int(profile["hours-per-week"]))
+        + COSTS["occupation"] * (indices["occupation"] != 0)
+        + COSTS["workclass"] * (indices["workclass"] != 0)
+    )
+    # Index 0 is the profile's own value, so a non-zero index is a change.
+    n_changed = sum((index != 0).astype(int) for index in indices.values())
+    # Cheapest first; among equal costs, fewer changed attributes first.
+    order = np.lexsort((n_changed, cost))
+    order = order[n_changed[order] > 0]
+    return values, {a: index[order] for a, index in indices.items()}, cost[order]
+
+
+def _dominated(indices, values, solution):
+    """Mask of candidates that make every change ``solution`` makes, at least as far."""
+    mask = indices["educational-num"] >= solution["educational-num"]
+    hours = np.asarray(values["hours-per-week"])
+    change = hours[indices["hours-per-week"]] - hours[0]
+    solution_change = hours[solution["hours-per-week"]] - hours[0]
+    if solution_change:
+        mask &= (np.sign(change) == np.sign(solution_change)) & (np.abs(change) >= abs(solution_change))
+    for attribute in ("occupation", "workclass"):
+        if solution[attribute]:
+            mask &= indices[attribute] == solution[attribute]
+    return mask
+
+
+def build_frame(profile, values, indices):
+    n_rows = len(indices["educational-num"])
+    columns = {c: np.repeat(np.asarray([profile[c]], dtype=object), n_rows) for c in FEATURE_COLUMNS}
+    for attribute in ACTIONABLE_ATTRIBUTES:
+        columns[attribute] = np.asarray(values[attribute], dtype=object)[indices[attribute]]
+    frame = pd.DataFrame(columns, columns=FEATURE_COLUMNS)
+    for column in NUMERIC_RANGES:
+        frame[column] = frame[column].astype(np.int64)
+    return frame
+
+
+def encode_candidates(encoder, profile, values, indices):
+    """Encoded rows for the candidates: the profile's row with only the actionable columns rewritten."""
+    n_rows = len(indices["educational-num"])
+    X = np.repeat(encoder.encode(profile), n_rows, axis=0)
+    numeric, categorical = dict(encoder.numeric), dict(encoder.categorical)
+    for attribute in ("educational-num", "hours-per-week"):
+        X[:, numeric[attribute]] = np.asarray(values[attribute], dtype=np.float64)[indices[attribute]]
+    for attribute in ("occupation", "workclass"):
+        lookup = categorical[attribute]
+        X[:, list(lookup.values())] = 0.0
+        columns = np.asarray([lookup.get(value, -1) for value in values[attribute]])[indices[attribute]]
+        known = columns >= 0
+        X[np.flatnonzero(known), columns[known]] = 1.0
+    return X
+
+
+def score_candidates(predictor, profile, values, indices):
+    """``(predictions, probabilities)`` of the candidates from one model call."""
+    encoder = predictor.encoder
+    if encoder is None or encoder.unknown_is_error:
+        return predictor.predict_frame(build_frame(profile, values, indices))
+    # Skips building and encoding a DataFrame, which costs more than the trees.
+    return predictor.predict_encoded(encode_candidates(encoder, profile, values, indices))
+
+
+def find_counterfactuals(predictor, profile, max_solutions=3, time_budget=TIME_BUDGET_SECONDS, max_hours=MAX_HOURS):
+    """Search for the cheapest changes that make ``predictor`` predict >50K for ``profile``.
+
+    Returns a dict with ``solutions`` (cheapest first; each has
+    ``changes`` as ``{attribute: (old, new)}``, ``cost`` and
+    ``probability``), the ``closest`` scored candidate when none flips,
+    and the search statistics.
+    """
+    start = time.perf_counter()
+    base_prediction, base_probability = predictor.predict_frame(pd.DataFrame([profile], columns=FEATURE_COLUMNS))
+    result = {
+        "base_probability": float(base_probability[0]),
+        "already_above": bool(base_prediction[0] == 1),
+        "solutions": [],
+        "closest": None,
+        "candidates": 0,
+        "scored": 0,
+        "pruned": 0,
+        "model_calls": 1,
+        "stopped": "already above",
+    }
+    if result["already_above"]:
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    values, indices, cost = candidate_grid(profile, max_hours)
+    result["candidates"] = len(cost)
+    result["stopped"] = "exhausted"
+    found = []
+    closest_probability = -1.0
+    position, batch_size = 0, FIRST_BATCH
+    rows_per_second = None
+    while position < len(cost):
+        remaining = time_budget - (time.perf_counter() - start)
+        if remaining <= 0:
+            result["stopped"] = "time budget"
+            break
+        if rows_per_second is not None:
+            # Size the batch to the time left, so one call cannot overrun the budget by much.
+            batch_size = max(FIRST_BATCH, min(batch_size, int(rows_per_second * remaining)))
+        batch = {a: index[position:position + batch_size] for a, index in indices.items()}
+        batch_cost = cost[position:position + batch_size]
+        position += batch_size
+        batch_size = min(batch_size * 2, MAX_BATCH)
+
+        keep = np.ones(len(batch_cost), dtype=bool)
+        for solution in found:
+            keep &= ~_dominated(batch, values, solution)
+        result["pruned"] += int((~keep).sum())
+        if not keep.any():
+            continue
+        batch = {a: index[keep] for a, index in batch.items()}
+        batch_cost = batch_cost[keep]
+        call_start = time.perf_counter()
+        predictions, probabilities = score_candidates(predictor, profile, values, batch)
+        rows_per_second = len(batch_cost) / max(time.perf_counter() - call_start, 1e-9)
+        result["model_calls"] += 1
+        result["scored"] += len(batch_cost)
+
+        best = int(np.argmax(probabilities))
+        if probabilities[best] > closest_probability:
+            closest_probability = float(probabilities[best])
+            result["closest"] = _describe(profile, values, batch, best, batch_cost, probabilities)
+        # Flips in cost order; a flip that repeats a cheaper one plus more is skipped.
+        for i in np.flatnonzero(np.asarray(predictions) == 1):
+            candidate = {a: int(index[i]) for a, index in batch.items()}
+            if any(_dominated({a: np.array([v]) for a, v in candidate.items()}, values, s)[0] for s in found):
+                continue
+            found.append(candidate)
+            result["solutions"].append(_describe(profile, values, batch, i, batch_cost, probabilities))
+            if len(found) >= max_solutions:
+                break
+        if len(found) >= max_solutions:
+            result["stopped"] = "enough solutions"
+            break
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _describe(profile, values, batch, i, batch_cost, probabilities):
+    changes = {}
+    for attribute in ACTIONABLE_ATTRIBUTES:
+        new = values[attribute][batch[attribute][i]]
+        if batch[attribute][i] != 0:
+            changes[attribute] = (profile[attribute], new)
+    return {"changes": changes, "cost": float(batch_cost[i]), "probability": float(probabilities[i])}
+
+
+def describe_changes(changes):
+    """``"Educational Years: 10 → 13, Hours per Week: 40 → 45"``."""
+    return ", ".join(f"{ATTRIBUTE_LABELS[a]}: {old} → {new}" for a, (old, new) in changes.items())
@@ -0,0 +1,283 @@
+"""Build a smaller variant of the salary pipeline for constrained deployments.
+
+    python distill.py truncate --data adult.csv --max-disagreement 0.01 --out best_model_compact.pkl
+    python distill.py student --n-estimators 60 --max-depth 3 --out best_model_student.pkl
+
+``truncate`` keeps the first trees of every ensemble in the model: the
+first boosting stages of gradient boosting, or the first estimators of a
+forest. It picks the fewest trees whose labels stay within
+``--max-disagreement`` of the original.
+
+``student`` trains a new GradientBoostingClassifier on the original
+model's probabilities. Each transfer row appears once per class, weighted
+by the teacher's probability for that class, so the student fits the soft
+targets under log loss rather than only the hard labels.
+
+Both modes keep the original fitted preprocessor and write an ordinary
+pipeline pickle. Both report model size, single-row latency, batch
+throughput, and agreement and F1 against the original. F1 treats the
+original model's labels as the truth. Rows come from ``--data`` if given
+(the student trains on the rows after the evaluation rows, so the two
+never overlap), otherwise from profiles sampled uniformly over the form's
+ranges. Those put far more rows near the decision boundary (and at large
+capital gains) than real data does, so the sampled estimates are
+pessimistic. On them the shipped 487-tree model changes 3.6% of labels
+at 400 trees and 1.6% at 475, so ``truncate`` cannot meet the default
+1% budget without ``--data``. Without real data, widen the budget
+(``--max-disagreement 0.02`` keeps 475 trees) or pass ``--trees``.
+
+The variant is only written to ``--out`` when it is within
+``--max-disagreement`` and, if given, ``--max-latency-us``; ``--force``
+writes it anyway.
+
+To serve the variant, point the app at it:
+
+    SALARY_MODEL_PATH=best_model_compact.pkl streamlit run app.py
+
+``--artifact DIR`` also exports it as a model_artifact.py directory.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+from inference import Predictor
+from schema import sample_profiles
+from tree_engine import as_float32, compile_model
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+
+TREE_CANDIDATES = (5, 10, 15, 20, 30, 40, 50, 60, 80, 100, 125, 150, 200, 250, 300, 350, 400, 450, 475)
+
+
+def truncate_estimator(model, n_trees):
+    """A copy of a fitted GB, forest or VotingClassifier keeping the first ``n_trees`` trees of each."""
+    from sklearn.ensemble import GradientBoostingClassifier, VotingClassifier
+    from sklearn.ensemble._forest import ForestClassifier
+
+    if isinstance(model, VotingClassifier):
+        model = copy.copy(model)
+        model.estimators_ = [truncate_estimator(est, n_trees) for est in model.estimators_]
+        return model
+    if isinstance(model, GradientBoostingClassifier):
+        n_trees = min(n_trees, model.n_estimators_)
+        model = copy.deepcopy(model)
+        model.estimators_ = model.estimators_[:n_trees]
+        model.train_score_ = model.train_score_[:n_trees]
+        for name in ("oob_improvement_", "oob_scores_"):
+            if hasattr(model, name):
+                setattr(model, name, getattr(model, name)[:n_trees])
+        model.n_estimators = model.n_estimators_ = n_trees
+        return model
+    if isinstance(model, ForestClassifier):
+        model = copy.deepcopy(model)
+        model.estimators_ = model.estimators_[:n_trees]
+        model.n_estimators = len(model.estimators_)
+        return model
+    raise ValueError(f"Cannot truncate estimator of type {type(model).__name__}.")
+
+
+def with_classifier(pipeline, classifier):
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline(pipeline.steps[:-1] + [(pipeline.steps[-1][0], classifier)])
+
+
+def choose_tree_count(pipeline, X, max_disagreement, candidates=TREE_CANDIDATES):
+    """Fewest trees (from ``candidates``) whose labels stay within the disagreement budget on encoded ``X``.
+
+    Returns ``(n_trees, disagreement)``; ``n_trees`` is None when no
+    candidate fits, and the disagreement is then that of the largest one.
+    """
+    evaluator = compile_model(pipeline.steps[-1][1]).evaluator
+    reference = evaluator.predict(X)
+    disagreement = None
+    for n_trees in candidates:
+        disagreement = float(np.mean(evaluator.truncated(n_trees).predict(X) != reference))
+        if disagreement <= max_disagreement:
+            return n_trees, disagreement
+    return None, disagreement
+
+
+def train_student(pipeline, frame, n_estimators, max_depth, learning_rate, random_state=0):
+    """Fit a GradientBoostingClassifier student on the teacher's probabilities over ``frame``."""
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    X = pipeline[:-1].transform(frame)
+    proba = pipeline.predict_proba(frame)
+    classes = pipeline.classes_
+    n_rows = X.shape[0]
+    # One copy of the rows per class, weighted by the teacher's probability.
+    X_soft = X[np.tile(np.arange(n_rows), len(classes))]
+    y_soft = np.repeat(classes, n_rows)
+    weights = proba.T.ravel()
+    student = GradientBoostingClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, learning_rate=learning_rate, random_state=random_state
+    )
+    student.fit(X_soft, y_soft, sample_weight=weights)
+    return with_classifier(pipeline, student)
+
+
+def pickled_size(obj):
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.tell()
+
+
+def count_nodes(model):
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        return model.tree_.node_count if hasattr(model, "tree_") else 0
+    return sum(count_nodes(est) for est in np.ravel(np.asarray(estimators, dtype=object)))
+
+
+def describe(pipeline, frame, repeat=300):
+    """Size and speed of ``pipeline`` through the same fast path the app uses."""
+    predictor = Predictor.from_pipeline(pipeline)
+    record = frame.iloc[0].to_dict()
+    predictor.predict_record(record)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predictor.predict_record(record)
+    single = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    predictor.predict_frame(frame)
+    batch = time.perf_counter() - start
+    return {
+        "pickle_bytes": pickled_size(pipeline),
+        "tree_nodes": count_nodes(pipeline.steps[-1][1]),
+        "fast_path": predictor.fast_path,
+        "single_row_us": single * 1e6,
+        "batch_rows_per_second": len(frame) / batch,
+    }
+
+
+def compare(original, variant, frame):
+    from sklearn.metrics import f1_score
+
+    reference = original.predict(frame)
+    predicted = variant.predict(frame)
+    positive = original.classes_[-1]
+    return {
+        "agreement": float(np.mean(predicted == reference)),
+        "f1_vs_original": float(f1_score(reference, predicted, pos_label=positive)),
+        "max_probability_gap": float(np.max(np.abs(
+            original.predict_proba(frame)[:, -1] - variant.predict_proba(frame)[:, -1]
+        ))),
+    }
+
+
+def load_frames(path, eval_rows, train_rows=0):
+    """``(eval_frame, train_frame)``: disjoint slices of ``path``, or independent samples."""
+    if path is None:
+        return sample_profiles(eval_rows, seed=11), sample_profiles(train_rows, seed=12)
+    from cascade import load_rows
+
+    rows = load_rows(path, eval_rows + train_rows)
+    return rows.iloc[:eval_rows].reset_index(drop=True), rows.iloc[eval_rows:].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distill or truncate the salary model into a smaller variant.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    truncate = sub.add_parser("truncate", help="keep the fewest leading trees within the accuracy budget")
+    truncate.add_argument("--trees", type=int, help="keep exactly this many trees instead of searching")
+    student = sub.add_parser("student", help="train a smaller gradient boosting model on the teacher")
+    student.add_argument("--n-estimators", type=int, default=60)
+    student.add_argument("--max-depth", type=int, default=3)
+    student.add_argument("--learning-rate", type=float, default=0.2)
+    student.add_argument("--train-rows", type=int, default=40_000, help="transfer rows (default: %(default)s)")
+    for mode in (truncate, student):
+        mode.add_argument("--model", default=MODEL_PATH)
+        mode.add_argument("--data", help="CSV or Parquet rows to evaluate (and train the student) on "
+                                         "(default: sampled profiles)")
+        mode.add_argument("--eval-rows", type=int, default=20_000)
+        mode.add_argument("--max-disagreement", type=float, default=0.01,
+                          help="accuracy budget: largest share of labels allowed to change (default: %(default)s)")
+        mode.add_argument("--max-latency-us", type=float,
+                          help="latency budget: slowest acceptable single-row prediction, in microseconds")
+        mode.add_argument("--out", required=True, help="where to write the variant pipeline pickle")
+        mode.add_argument("--force", action="store_true", help="write --out even when outside the budget")
+        mode.add_argument("--artifact", help="also export the variant as a model artifact directory")
+        mode.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    original = joblib.load(args.model)
+    eval_frame, train_frame = load_frames(args.data, args.eval_rows, args.train_rows if args.mode == "student" else 0)
+
+    if args.mode == "truncate":
+        n_trees = args.trees
+        if n_trees is None:
+            X = as_float32(original[:-1].transform(eval_frame))
+            n_trees, disagreement = choose_tree_count(original, X, args.max_disagreement)
+            if n_trees is None:
+                parser.error(f"even {TREE_CANDIDATES[-1]} trees change {disagreement:.2%} of labels; "
+                             "evaluate on --data, raise --max-disagreement or pass --trees")
+        variant = with_classifier(original, truncate_estimator(original.steps[-1][1], n_trees))
+        settings = {"trees": n_trees}
+    else:
+        if train_frame.empty:
+            parser.error(f"{args.data} has no rows left for training after the {args.eval_rows:,} evaluation rows")
+        start = time.perf_counter()
+        variant = train_student(original, train_frame, args.n_estimators, args.max_depth, args.learning_rate)
+        settings = {
+            "n_estimators": args.n_estimators, "max_depth": args.max_depth,
+            "learning_rate": args.learning_rate, "train_rows": len(train_frame),
+            "train_seconds": time.perf_counter() - start,
+        }
+
+    quality = compare(original, variant, eval_frame)
+    report = {
+        "mode": args.mode,
+        "settings": settings,
+        "original": describe(original, eval_frame),
+        "variant": describe(variant, eval_frame),
+        "quality": quality,
+        "max_disagreement": args.max_disagreement,
+        "max_latency_us": args.max_latency_us,
+        "eval_rows": len(eval_frame),
+        "data": args.data,
+    }
+    report["within_budget"] = 1 - quality["agreement"] <= args.max_disagreement and (
+        args.max_latency_us is None or report["variant"]["single_row_us"] <= args.max_latency_us
+    )
+    report["written"] = report["within_budget"] or args.force
+    if report["written"]:
+        joblib.dump(variant, args.out)
+        if args.artifact:
+            from model_artifact import export_artifact
+            export_artifact(args.out, args.artifact)
+
+    o, v = report["original"], report["variant"]
+    print(f"{args.mode} {settings}")
+    print(f"{'':>22} {'original':>12} {'variant':>12} {'gain':>8}")
+    for key in ("pickle_bytes", "tree_nodes", "single_row_us", "batch_rows_per_second"):
+        gain = v[key] / o[key] if key == "batch_rows_per_second" else o[key] / max(v[key], 1e-9)
+        print(f"{key:>22} {o[key]:>12,.0f} {v[key]:>12,.0f} {gain:>7.2f}x")
+    budget = f"{args.max_disagreement:.2%} disagreement"
+    if args.max_latency_us is not None:
+        budget += f" / {args.max_latency_us:,.0f} us"
+    print(f"agreement {quality['agreement']:.4%}, F1 vs original {quality['f1_vs_original']:.4f}, "
+          f"{'within' if report['within_budget'] else 'OUTSIDE'} the {budget} budget")
+    if report["written"]:
+        print(f"wrote {args.out}")
+    else:
+        print(f"did not write {args.out}; pass --force to write a variant outside the budget")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
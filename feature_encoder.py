@@ -0,0 +1,126 @@
+"""Direct encoder from input records to the pipeline's feature vector.
+
+The fitted ``ColumnTransformer`` one-hot encodes the categorical columns
+and passes the numeric ones through. For a single row, almost all of
+its cost is pandas and sklearn dispatch. ``RecordEncoder`` reads the fitted
+categories and the output column layout once. After that, encoding a
+record is a few dict lookups into a zeroed vector.
+"""
+import numpy as np
+
+from schema import FEATURE_COLUMNS
+
+
+class RecordEncoder:
+    def __init__(self, n_features, numeric, categorical, unknown_is_error=()):
+        # numeric: [(input column, output index)]
+        # categorical: [(input column, {category: output index})]
+        self.n_features = n_features
+        self.numeric = numeric
+        self.categorical = categorical
+        self.unknown_is_error = set(unknown_is_error)
+        self._template = np.zeros(n_features)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, columns=FEATURE_COLUMNS):
+        """Build an encoder from a fitted ``Pipeline(ColumnTransformer, ...)``.
+
+        Raises ValueError for transformers other than one-hot encoding,
+        passthrough and drop, since those cannot be replayed by lookups.
+        """
+        from sklearn.compose import ColumnTransformer
+        from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+        preprocessor = pipeline.steps[0][1]
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError("The first pipeline step is not a ColumnTransformer.")
+        input_columns = list(getattr(preprocessor, "feature_names_in_", columns))
+
+        numeric, categorical, unknown_is_error = [], [], []
+        offset = 0
+        for name, transformer, selected in preprocessor.transformers_:
+            if transformer == "drop" or len(selected) == 0:
+                continue
+            selected = [input_columns[c] if isinstance(c, (int, np.integer)) else c for c in selected]
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop is not None or getattr(transformer, "_infrequent_enabled", False):
+                    raise ValueError(f"One-hot encoder '{name}' uses drop or infrequent categories.")
+                for column, categories in zip(selected, transformer.categories_):
+                    categorical.append((column, {c: offset + i for i, c in enumerate(categories)}))
+                    if transformer.handle_unknown == "error":
+                        unknown_is_error.append(column)
+                    offset += len(categories)
+            elif transformer == "passthrough" or (
+                isinstance(transformer, FunctionTransformer) and transformer.func is None
+            ):
+                for column in selected:
+                    numeric.append((column, offset))
+                    offset += 1
+            else:
+                raise ValueError(f"Transformer '{name}' ({type(transformer).__name__}) cannot be encoded directly.")
+        return cls(offset, numeric, categorical, unknown_is_error)
+
+    def to_state(self):
+        """JSON-serializable description, the inverse of ``from_state``."""
+        return {
+            "n_features": self.n_features,
+            "numeric": [[column, index] for column, index in self.numeric],
+            "categorical": [[column, list(lookup)] for column, lookup in self.categorical],
+            "categorical_offsets": [next(iter(lookup.values())) for _, lookup in self.categorical],
+            "unknown_is_error": sorted(self.unknown_is_error),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        categorical = [
+            (column, {c: offset + i for i, c in enumerate(categories)})
+            for (column, categories), offset in zip(state["categorical"], state["categorical_offsets"])
+        ]
+        numeric = [(column, index) for column, index in state["numeric"]]
+        return cls(state["n_features"], numeric, categorical, state["unknown_is_error"])
+
+    def encode(self, record):
+        """Encode one ``{column: value}`` dict into a (1, n_features) array."""
+        x = self._template.copy()
+        for column, index in self.numeric:
+            x[index] = record[column]
+        for column, lookup in self.categorical:
+            index = lookup.get(record[column])
+            if index is not None:
+                x[index] = 1.0
+            elif column in self.unknown_is_error:
+                raise ValueError(f"Found unknown category {record[column]!r} in column '{column}'.")
+        return x.reshape(1, -1)
+
+    def encode_frame(self, frame):
+        """Encode every row of a DataFrame into an (n_rows, n_features) array."""
+        import pandas as pd
+
+        n_rows = len(frame)
+        X = np.zeros((n_rows, self.n_features))
+        rows = np.arange(n_rows)
+        for column, index in self.numeric:
+            X[:, index] = frame[column].to_numpy(dtype=np.float64)
+        for column, lookup in self.categorical:
+            codes = pd.Categorical(frame[column], categories=list(lookup)).codes
+            known = codes >= 0
+            if column in self.unknown_is_error and not known.all():
+                raise ValueError(f"Found unknown categories in column '{column}'.")
+            # Categories were enumerated in output order, so code i maps to
+            # the i-th output column of this block.
+            first = next(iter(lookup.values()))
+            X[rows[known], first + codes[known]] = 1.0
+        return X
+
+    def verify(self, pipeline, frame):
+        """True if ``encode``/``encode_frame`` equal the pipeline's own transform."""
+        expected = pipeline.steps[0][1].transform(frame)
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        expected = np.asarray(expected, dtype=np.float64)
+        if not np.array_equal(self.encode_frame(frame), expected):
+            return False
+        return all(
+            np.array_equal(self.encode(record), expected[i:i + 1])
+            for i, record in enumerate(frame.to_dict("records"))
+        )
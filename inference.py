@@ -0,0 +1,174 @@
+"""Fast prediction path used by the interactive predictor.
+
+``Predictor`` wraps a fitted pipeline with the direct ``RecordEncoder``
+and the compiled tree evaluator, which scores single rows and small
+batches; larger batches use the pipeline's own classifier on the encoded
+rows. When the encoder or evaluator cannot handle the pipeline,
+or the encoder's output does not reproduce the pipeline's own transform,
+it falls back to the sklearn objects, so predictions never change.
+
+``load_predictor`` accepts either a pipeline pickle or a directory
+written by ``model_artifact.py``. The artifact is loaded without pickle
+or sklearn.
+"""
+import os
+import time
+
+import numpy as np
+
+from feature_encoder import RecordEncoder
+from metrics import METRICS
+from schema import FEATURE_COLUMNS, sample_profiles
+from tree_engine import as_float32, compile_model
+
+# Profiles checked against pipeline.transform before the fast path is used.
+VERIFY_ROWS = 200
+# Larger encoded batches go to the pipeline's own classifier: its compiled
+# tree loops beat the NumPy evaluator beyond a few hundred rows (see
+# tree_engine.py), while the evaluator is several times faster below.
+COMPILED_MAX_ROWS = 256
+
+
+class Predictor:
+    def __init__(self, pipeline, encoder, classifier, model_hash=None, cache=None):
+        # pipeline is None for artifacts; then encoder and classifier are
+        # always the fast path.
+        self.pipeline = pipeline
+        self.encoder = encoder
+        self.classifier = classifier
+        self.model_hash = model_hash
+        # Optional PredictionCache; only used when model_hash is known.
+        self.cache = cache if model_hash is not None else None
+        self.classes_ = classifier.classes_
+        self.positive_index = list(self.classes_).index(1)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, model_hash=None, cache=None):
+        encoder = None
+        classifier = pipeline.steps[-1][1]
+        try:
+            candidate = RecordEncoder.from_pipeline(pipeline)
+            if candidate.verify(pipeline, sample_profiles(VERIFY_ROWS)):
+                encoder = candidate
+        except ValueError:
+            pass
+        if encoder is not None:
+            try:
+                classifier = compile_model(classifier).evaluator
+            except ValueError:
+                pass
+        return cls(pipeline, encoder, classifier, model_hash=model_hash, cache=cache)
+
+    @property
+    def fast_path(self):
+        return self.encoder is not None
+
+    def predict_encoded(self, X):
+        X = as_float32(X)
+        with METRICS.stage("classifier"):
+            if self.pipeline is not None and X.shape[0] > COMPILED_MAX_ROWS:
+                classifier = self.pipeline.steps[-1][1]
+                return classifier.predict(X), positive_proba(classifier, X, self.positive_index)
+            if hasattr(self.classifier, "predict_and_proba"):
+                predictions, proba = self.classifier.predict_and_proba(X)
+            else:
+                predictions, proba = self.classifier.predict(X), self.classifier.predict_proba(X)
+        return predictions, proba[:, self.positive_index]
+
+    def _predict_sklearn(self, frame):
+        # Same steps as pipeline.predict/predict_proba, but the transform
+        # runs once and each stage can be timed.
+        with METRICS.stage("transform"):
+            X = self.pipeline[:-1].transform(frame)
+        with METRICS.stage("classifier"):
+            classifier = self.pipeline.steps[-1][1]
+            return classifier.predict(X), positive_proba(classifier, X, self.positive_index)
+
+    def predict_record(self, record):
+        """Return ``(prediction, probability of >50K)`` for one input dict."""
+        METRICS.inc("predictions")
+        try:
+            with METRICS.stage("predict_record"):
+                if self.cache is not None:
+                    return self.cache.get_or_compute(self.model_hash, record, self._predict_record)
+                return self._predict_record(record)
+        except Exception:
+            METRICS.inc("prediction_errors")
+            raise
+
+    def _predict_record(self, record):
+        if self.encoder is None:
+            import pandas as pd
+            with METRICS.stage("build_frame"):
+                frame = pd.DataFrame([record], columns=FEATURE_COLUMNS)
+            predictions, probabilities = self._predict_sklearn(frame)
+        else:
+            with METRICS.stage("encode"):
+                X = self.encoder.encode(record)
+            predictions, probabilities = self.predict_encoded(X)
+        return predictions[0], probabilities[0]
+
+    def predict_frame(self, frame):
+        """Return prediction and >50K probability arrays for a DataFrame."""
+        METRICS.inc("predictions", len(frame))
+        try:
+            with METRICS.stage("predict_frame"):
+                if self.encoder is None:
+                    return self._predict_sklearn(frame)
+                with METRICS.stage("encode_frame"):
+                    X = self.encoder.encode_frame(frame)
+                return self.predict_encoded(X)
+        except Exception:
+            METRICS.inc("prediction_errors")
+            raise
+
+    def predict_proba_frame(self, frame):
+        METRICS.inc("predictions", len(frame))
+        try:
+            with METRICS.stage("predict_frame"):
+                if self.encoder is None:
+                    with METRICS.stage("transform"):
+                        X = self.pipeline[:-1].transform(frame)
+                    with METRICS.stage("classifier"):
+                        return positive_proba(self.pipeline.steps[-1][1], X, self.positive_index)
+                with METRICS.stage("encode_frame"):
+                    X = as_float32(self.encoder.encode_frame(frame))
+                return self.predict_encoded(X)[1]
+        except Exception:
+            METRICS.inc("prediction_errors")
+            raise
+
+
+def positive_proba(classifier, X, positive_index):
+    """P(>50K) from a sklearn classifier; NaN when it has none (hard voting)."""
+    if not hasattr(classifier, "predict_proba"):
+        return np.full(X.shape[0], np.nan)
+    return classifier.predict_proba(X)[:, positive_index]
+
+
+def model_signature(path):
+    """``(mtime_ns, size)`` of a model pickle or artifact manifest, or None."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "manifest.json")
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def load_predictor(path, cache=None):
+    """Load a Predictor from a pipeline pickle or an artifact directory."""
+    start = time.perf_counter()
+    if os.path.isdir(path):
+        from model_artifact import load_artifact
+        predictor = load_artifact(path, cache=cache)
+    else:
+        import joblib
+        from prediction_cache import file_sha256
+
+        pipeline = joblib.load(path)
+        predictor = Predictor.from_pipeline(pipeline, model_hash=file_sha256(path), cache=cache)
+    METRICS.inc("model_loads")
+    METRICS.set_gauge("model_load_seconds", time.perf_counter() - start)
+    return predictor
@@ -0,0 +1,213 @@
+"""Opt-in timing and counters for the prediction hot path.
+
+Set ``SALARY_METRICS=1`` to enable it. Each stage of a prediction is
+timed with ``perf_counter_ns``: input encoding, the sklearn transform, the
+classifier, and each ensemble member and the vote. The timings go into a
+histogram per stage. When disabled, ``METRICS.stage()`` returns a shared
+no-op context manager and ``inc``/``observe`` return right away, so the
+cost is one attribute check per call site.
+
+``METRICS.prometheus_text()`` renders everything in the Prometheus text
+format. It is served by ``serve.py`` at ``/metrics``, and by
+``start_metrics_server`` when ``SALARY_METRICS_PORT`` is set for the app.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+ENABLED = os.environ.get("SALARY_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Upper bounds in seconds, from 10 µs (one cached or compiled row) to 10 s
+# (a large batch).
+BUCKETS = (
+    1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+    1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Quantiles on the diagnostics page are over this many recent observations.
+WINDOW = 2048
+
+PREFIX = "salary_predictor"
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts for Prometheus plus a window of recent samples."""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = np.asarray(self.recent)
+        if not len(recent):
+            return {"count": self.count, "window": 0}
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+        return {
+            "count": self.count,
+            "window": len(recent),
+            "mean_ms": float(recent.mean()) * 1e3,
+            "p50_ms": float(p50) * 1e3,
+            "p95_ms": float(p95) * 1e3,
+            "p99_ms": float(p99) * 1e3,
+            "max_ms": float(recent.max()) * 1e3,
+        }
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter_ns() - self.start) / 1e9)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def stage(self, name):
+        """Context manager that records the time spent in its block under ``name``."""
+        if not self.enabled:
+            return _NOOP_STAGE
+        return _Stage(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "stages": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            }
+
+    def prometheus_text(self, cache=None):
+        """All metrics in the Prometheus text exposition format.
+
+        ``cache`` is an optional PredictionCache whose counters are
+        exported alongside.
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+            for name, value in sorted(self.gauges.items()):
+                lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+            if self.histograms:
+                metric = f"{PREFIX}_stage_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for stage, h in sorted(self.histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum:.9f}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        if cache is not None:
+            stats = cache.stats()
+            for name in ("hits", "misses", "evictions"):
+                lines += [f"# TYPE {PREFIX}_cache_{name}_total counter", f"{PREFIX}_cache_{name}_total {stats[name]}"]
+            lines += [f"# TYPE {PREFIX}_cache_entries gauge", f"{PREFIX}_cache_entries {stats['size']}"]
+            lines += [f"# TYPE {PREFIX}_cache_models gauge", f"{PREFIX}_cache_models {stats['models']}"]
+        lines.append(f"# TYPE {PREFIX}_metrics_enabled gauge")
+        lines.append(f"{PREFIX}_metrics_enabled {int(self.enabled)}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every session in this server process.
+METRICS = Metrics()
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="127.0.0.1", cache=None):
+    """Serve ``METRICS.prometheus_text()`` at http://host:port/metrics on a daemon thread.
+
+    Safe to call on every rerun; only the first call starts the server.
+    """
+    global _metrics_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.prometheus_text(cache).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _metrics_server
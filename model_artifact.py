@@ -0,0 +1,232 @@
+"""Pickle-free, memory-mappable model artifact.
+
+    python model_artifact.py export best_model_pipeline2.pkl model_artifact/
+    python model_artifact.py compare best_model_pipeline2.pkl model_artifact/ --processes 4
+
+``export`` compiles the pipeline with tree_engine and writes one ``.npy``
+file per node table, plus a ``manifest.json`` that holds the encoder
+layout, scalars and the source pickle's hash. ``load_artifact`` maps the
+tables read-only with ``np.load(mmap_mode="r")``. Loading takes a few
+milliseconds, imports neither pickle nor sklearn, and every worker
+process on the host shares the same page-cache pages.
+
+``compare`` starts fresh interpreters for both loaders and reports
+startup time, RSS and PSS. PSS is the proportional share of memory,
+where shared pages are split between processes.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from feature_encoder import RecordEncoder
+from inference import Predictor
+from tree_engine import ForestMember, GradientBoostingMember, TreeArrays, VotingModel
+
+FORMAT_NAME = "salary-model-artifact"
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def _classes_to_json(classes):
+    return np.asarray(classes).tolist()
+
+
+def _save_trees(trees, out_dir, prefix):
+    for name, array in trees.arrays().items():
+        np.save(os.path.join(out_dir, f"{prefix}.{name}.npy"), np.ascontiguousarray(array))
+    return {"prefix": prefix, "max_depth": int(trees.max_depth)}
+
+
+def _load_trees(spec, artifact_dir, mmap_mode):
+    arrays = {}
+    for name in TreeArrays.ARRAY_NAMES:
+        path = os.path.join(artifact_dir, f"{spec['prefix']}.{name}.npy")
+        if name in TreeArrays.OPTIONAL_ARRAY_NAMES and not os.path.exists(path):
+            continue
+        arrays[name] = np.asarray(np.load(path, mmap_mode=mmap_mode))
+    return TreeArrays.from_arrays(arrays, spec["max_depth"])
+
+
+def _member_state(member, out_dir, prefix):
+    if isinstance(member, GradientBoostingMember):
+        return {
+            "kind": "gradient_boosting",
+            "classes": _classes_to_json(member.classes_),
+            "learning_rate": float(member.learning_rate),
+            "init_raw": float(member.init_raw),
+            "trees": _save_trees(member.trees, out_dir, prefix),
+        }
+    if isinstance(member, ForestMember):
+        return {
+            "kind": "forest",
+            "classes": _classes_to_json(member.classes_),
+            "is_forest": bool(member.is_forest),
+            "trees": _save_trees(member.trees, out_dir, prefix),
+        }
+    if isinstance(member, VotingModel):
+        return {
+            "kind": "voting",
+            "classes": _classes_to_json(member.classes_),
+            "voting": member.voting,
+            "weights": None if member.weights is None else [float(w) for w in member.weights],
+            "members": [_member_state(m, out_dir, f"{prefix}.{i}") for i, m in enumerate(member.members)],
+        }
+    raise ValueError(f"Cannot export evaluator of type {type(member).__name__}.")
+
+
+def _member_from_state(state, artifact_dir, mmap_mode):
+    classes = np.asarray(state["classes"])
+    if state["kind"] == "gradient_boosting":
+        return GradientBoostingMember(classes, state["learning_rate"], state["init_raw"],
+                                      _load_trees(state["trees"], artifact_dir, mmap_mode))
+    if state["kind"] == "forest":
+        return ForestMember(classes, state["is_forest"], _load_trees(state["trees"], artifact_dir, mmap_mode))
+    if state["kind"] == "voting":
+        members = [_member_from_state(m, artifact_dir, mmap_mode) for m in state["members"]]
+        return VotingModel(state["voting"], classes, members, state["weights"])
+    raise ValueError(f"Unknown model kind {state['kind']!r} in artifact.")
+
+
+def export_artifact(model_path, out_dir):
+    """Compile the pipeline at ``model_path`` and write it to ``out_dir``.
+
+    Raises ValueError if the pipeline cannot go through the fast path,
+    because an artifact has no sklearn fallback.
+    """
+    import joblib
+    from prediction_cache import file_sha256
+
+    pipeline = joblib.load(model_path)
+    predictor = Predictor.from_pipeline(pipeline)
+    if predictor.encoder is None or not hasattr(predictor.classifier, "predict_and_proba"):
+        raise ValueError("This pipeline cannot be compiled, so it cannot be exported as an artifact.")
+
+    # Build in a sibling directory and swap it in, so a reader never sees
+    # a half-written artifact.
+    tmp_dir = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "source": os.path.basename(model_path),
+        "model_hash": file_sha256(model_path),
+        "encoder": predictor.encoder.to_state(),
+        "model": _member_state(predictor.classifier, tmp_dir, "model"),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def load_artifact(artifact_dir, cache=None, mmap_mode="r"):
+    with open(os.path.join(artifact_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{artifact_dir} is not a version {FORMAT_VERSION} model artifact.")
+    encoder = RecordEncoder.from_state(manifest["encoder"])
+    classifier = _member_from_state(manifest["model"], artifact_dir, mmap_mode)
+    return Predictor(None, encoder, classifier, model_hash=manifest["model_hash"], cache=cache)
+
+
+# Code run in a fresh interpreter by ``compare``. It loads the model, scores
+# a batch so every table is paged in, and reports once the parent has all
+# workers loaded (so PSS reflects sharing between them).
+_PROBE = r"""
+import json, os, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {base_dir!r})
+from inference import load_predictor
+predictor = load_predictor({path!r})
+load_seconds = time.perf_counter() - start
+record = {record!r}
+predictor.predict_record(record)
+import numpy as np
+predictor.predict_encoded(np.zeros((256, predictor.encoder.n_features)))
+print("ready", flush=True)
+sys.stdin.readline()
+pss_kb = None
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                pss_kb = int(line.split()[1])
+except OSError:
+    pass
+print(json.dumps({{
+    "load_seconds": load_seconds,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "pss_mb": None if pss_kb is None else pss_kb / 1024,
+    "sklearn_imported": "sklearn" in sys.modules,
+}}), flush=True)
+"""
+
+
+def measure_loader(path, processes=1):
+    from schema import sample_profiles
+
+    record = {k: (v.item() if hasattr(v, "item") else v) for k, v in sample_profiles(1).to_dict("records")[0].items()}
+    code = _PROBE.format(base_dir=os.path.dirname(os.path.abspath(__file__)), path=os.path.abspath(path), record=record)
+    wall_start = time.perf_counter()
+    children = [
+        subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(processes)
+    ]
+    for child in children:
+        line = child.stdout.readline().strip()
+        if line != "ready":
+            raise RuntimeError(f"loader for {path} failed to start")
+    wall_seconds = time.perf_counter() - wall_start
+    results = []
+    for child in children:
+        child.stdin.write("\n")
+        child.stdin.flush()
+        results.append(json.loads(child.stdout.readline()))
+        child.wait()
+    summary = {
+        "processes": processes,
+        "wall_seconds_all_ready": wall_seconds,
+        "load_seconds_mean": sum(r["load_seconds"] for r in results) / processes,
+        "max_rss_mb_mean": sum(r["max_rss_mb"] for r in results) / processes,
+        "sklearn_imported": results[0]["sklearn_imported"],
+    }
+    if all(r["pss_mb"] is not None for r in results):
+        summary["pss_mb_total"] = sum(r["pss_mb"] for r in results)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or benchmark the memory-mappable model artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write an artifact directory from a pipeline pickle")
+    export.add_argument("model")
+    export.add_argument("out_dir")
+    compare = sub.add_parser("compare", help="compare startup time and memory of both loaders")
+    compare.add_argument("model")
+    compare.add_argument("artifact")
+    compare.add_argument("--processes", type=int, default=1, help="concurrent worker processes per loader")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        manifest = export_artifact(args.model, args.out_dir)
+        size = sum(os.path.getsize(os.path.join(args.out_dir, f)) for f in os.listdir(args.out_dir))
+        print(f"wrote {args.out_dir} ({size / 1024:.0f} KB) from {manifest['source']} ({manifest['model_hash'][:12]})")
+        return
+
+    results = {
+        "joblib pickle": measure_loader(args.model, args.processes),
+        "mmap artifact": measure_loader(args.artifact, args.processes),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Versioned model registry with background reloads.
+
+    python model_registry.py publish best_model_compact.pkl --registry models
+    python model_registry.py promote 1 --registry models
+    python model_registry.py list --registry models
+
+A registry is a directory with one entry per version. An entry is either
+a ``<version>.pkl`` pipeline pickle or a ``<version>/`` artifact
+directory written by model_artifact.py. The active version is the one
+named in the ``CURRENT`` file. Without that file, it is the highest
+version. ``publish`` copies a model in under a hidden name and then
+renames it, so a watcher never sees a half-written version. ``promote``
+rewrites ``CURRENT`` the same way, so rolling back is a promote too.
+
+``ModelRegistry`` loads the active version when it starts. After that a
+daemon thread polls the registry. When the active version changes, the
+thread loads the new one and warms it with a few predictions, off the
+request path. It then swaps the new one in with a single assignment.
+Callers that already hold the old predictor finish on it, and new
+callers get the new one. The old predictor stays in memory until its
+last user drops it. The watcher loads nothing else meanwhile, so at most
+two versions are resident. A version that fails to load or warm is
+skipped, and the current one keeps serving.
+
+A plain pickle or artifact path acts as a one-version registry. It is
+reloaded in the same way when the file is replaced.
+"""
+import argparse
+import gc
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+
+from inference import load_predictor, model_signature
+from metrics import METRICS
+from schema import sample_profiles
+
+CURRENT_FILE = "CURRENT"
+POLL_SECONDS = 5.0
+WARM_ROWS = 64
+MAX_RESIDENT = 2
+
+
+def _version_key(name):
+    # "10" sorts after "9" and "v10" after "v9".
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", name) if part]
+
+
+def is_registry(path):
+    """True for a registry directory, False for a pickle or an artifact directory."""
+    return os.path.isdir(path) and not os.path.isfile(os.path.join(path, "manifest.json"))
+
+
+def list_versions(root):
+    """``{version: path}`` of the complete versions in ``root``, lowest first."""
+    versions = {}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(".") or name == CURRENT_FILE:
+            continue
+        if name.endswith(".pkl") and os.path.isfile(path):
+            versions[name[:-len(".pkl")]] = path
+        elif os.path.isfile(os.path.join(path, "manifest.json")):
+            versions[name] = path
+    return dict(sorted(versions.items(), key=lambda item: _version_key(item[0])))
+
+
+def active_version(root):
+    """``(version, path)`` of the version named in CURRENT, else the highest; None if there are none."""
+    versions = list_versions(root)
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        name = ""
+    if name:
+        if name not in versions:
+            raise FileNotFoundError(f"{CURRENT_FILE} names version {name!r}, which is not in {root}.")
+        return name, versions[name]
+    if not versions:
+        return None
+    name = next(reversed(versions))
+    return name, versions[name]
+
+
+def promote(root, version):
+    """Make ``version`` the active one."""
+    if version not in list_versions(root):
+        raise ValueError(f"Version {version!r} is not in {root}.")
+    staging = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(staging, "w") as f:
+        f.write(version + "\n")
+    os.replace(staging, os.path.join(root, CURRENT_FILE))
+
+
+def publish(root, model_path, version=None, activate=True):
+    """Copy a pipeline pickle or artifact directory into ``root`` as a new version; returns its name."""
+    os.makedirs(root, exist_ok=True)
+    versions = list_versions(root)
+    if version is None:
+        version = str(max((int(v) for v in versions if v.isdigit()), default=0) + 1)
+    if version in versions or version == CURRENT_FILE or version.startswith("."):
+        raise ValueError(f"Version {version!r} already exists in {root} or is not a valid name.")
+    if not activate and versions and not os.path.exists(os.path.join(root, CURRENT_FILE)):
+        # Pin the version that is active now, or the new one would take over
+        # as the highest.
+        promote(root, active_version(root)[0])
+    staging = os.path.join(root, f".staging-{version}")
+    if os.path.isdir(model_path):
+        shutil.copytree(model_path, staging)
+        target = os.path.join(root, version)
+    else:
+        shutil.copyfile(model_path, staging)
+        target = os.path.join(root, version + ".pkl")
+    os.replace(staging, target)
+    if activate:
+        promote(root, version)
+    return version
+
+
+class ModelRegistry:
+    """The active Predictor of a registry, reloaded by a background watcher."""
+
+    def __init__(self, path, cache=None, poll_seconds=POLL_SECONDS, warm_rows=WARM_ROWS, max_resident=MAX_RESIDENT):
+        self.path = path
+        self.cache = cache
+        self.poll_seconds = poll_seconds
+        self.warm_rows = warm_rows
+        self.max_resident = max_resident
+        # (version, predictor, key) replaced as one object so readers never
+        # see a version paired with another version's predictor.
+        self._active = None
+        # Earlier versions that some caller may still be using. The watcher
+        # and request threads (status()) both prune it, so it is only
+        # touched under _lock.
+        self._retired = []
+        self._lock = threading.Lock()
+        # Set by a swap; the next resident() runs one gc.collect().
+        self._collect_pending = False
+        self._failed_key = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.swaps = 0
+        self.last_error = None
+
+    def _locate(self):
+        if is_registry(self.path):
+            found = active_version(self.path)
+            if found is None:
+                raise FileNotFoundError(f"No model versions in {self.path}.")
+            version, path = found
+        else:
+            version, path = os.path.basename(self.path), self.path
+        signature = model_signature(path)
+        if signature is None:
+            raise FileNotFoundError(f"Model file not found at {path}.")
+        # Replacing a version in place changes its signature, so it reloads too.
+        return version, path, (version, path, signature)
+
+    def warm(self, predictor):
+        """Run a batch and a single row through ``predictor`` before it takes traffic."""
+        # predict_frame skips the prediction cache, so warming leaves no
+        # sampled profiles in it.
+        frame = sample_profiles(self.warm_rows, seed=0)
+        predictor.predict_frame(frame)
+        predictor.predict_frame(frame.head(1))
+
+    def predictor(self):
+        """The active Predictor. Keep it for the whole request rather than calling again."""
+        return self._active[1] if self._active is not None else None
+
+    @property
+    def version(self):
+        return self._active[0] if self._active is not None else None
+
+    def _prune(self):
+        # Caller holds the lock.
+        self._retired = [(version, ref) for version, ref in self._retired if ref() is not None]
+
+    def resident(self):
+        """Versions in memory: the active one plus retired ones still referenced."""
+        with self._lock:
+            self._prune()
+            collect = bool(self._retired) and self._collect_pending
+            self._collect_pending = False
+        if collect:
+            # Reference cycles can keep a finished predictor alive. Collect
+            # once per swap, outside the lock, rather than on every poll.
+            gc.collect()
+        with self._lock:
+            self._prune()
+            return len(self._retired) + (self._active is not None)
+
+    def check(self):
+        """Load, warm and activate the registry's active version if it changed. True on a swap."""
+        version, path, key = self._locate()
+        if self._active is not None and key == self._active[2] or key == self._failed_key:
+            return False
+        if self.resident() >= self.max_resident:
+            METRICS.inc("model_swaps_deferred")
+            return False
+        start = time.perf_counter()
+        try:
+            predictor = load_predictor(path, cache=self.cache)
+            self.warm(predictor)
+        except Exception as e:
+            if self._active is None:
+                raise
+            self._failed_key = key
+            self.last_error = f"version {version}: {e}"
+            METRICS.inc("model_load_failures")
+            return False
+        with self._lock:
+            previous = self._active
+            self._active = (version, predictor, key)
+            if previous is not None:
+                self._retired.append((previous[0], weakref.ref(previous[1])))
+                self._collect_pending = True
+                self.swaps += 1
+        if previous is not None:
+            METRICS.inc("model_swaps")
+        del previous
+        self.last_error = None
+        METRICS.set_gauge("model_warm_load_seconds", time.perf_counter() - start)
+        METRICS.set_gauge("model_versions_resident", self.resident())
+        return True
+
+    def start(self):
+        """Load the active version now, then watch for new ones on a daemon thread."""
+        if self._active is None:
+            self.check()
+        if self.poll_seconds and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                # A missing or broken registry entry must not kill the watcher.
+                self.last_error = str(e)
+            METRICS.set_gauge("model_versions_resident", self.resident())
+
+    def status(self):
+        predictor = self.predictor()
+        return {
+            "path": self.path,
+            "version": self.version,
+            "model_hash": predictor.model_hash if predictor is not None else None,
+            "fast_path": predictor.fast_path if predictor is not None else None,
+            "resident_versions": self.resident(),
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a versioned salary model registry.")
+    parser.add_argument("--registry", default="models", help="registry directory (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("publish", help="copy a pipeline pickle or artifact directory in as a new version")
+    add.add_argument("model")
+    add.add_argument("--version", help="version name (default: the next integer)")
+    add.add_argument("--no-activate", action="store_true", help="add the version without making it active")
+    use = sub.add_parser("promote", help="make an existing version the active one")
+    use.add_argument("version")
+    sub.add_parser("list", help="list versions and mark the active one")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        version = publish(args.registry, args.model, args.version, activate=not args.no_activate)
+        print(f"published version {version} to {args.registry}")
+    elif args.command == "promote":
+        promote(args.registry, args.version)
+        print(f"version {args.version} is now active")
+    else:
+        active = active_version(args.registry)
+        for version, path in list_versions(args.registry).items():
+            marker = "*" if active and version == active[0] else " "
+            print(f"{marker} {version:<12} {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Model loading and the prediction log, shared by the predictor and the other pages.
+
+The predictor, its contribution engine and the global importances are
+cached per server process, so every session and page shares one copy.
+The predictor comes from a ModelRegistry. Its watcher thread loads and
+warms a replaced model file or a newly promoted registry version, then
+swaps it in without a restart (see model_registry.py). Importances are
+also persisted to disk per model hash, so a restart does not recompute
+them. Setting SALARY_PREDICTION_LOG to a directory logs every interactive
+prediction there (see prediction_log.py).
+"""
+import os
+
+import streamlit as st
+
+from contributions import IMPORTANCE_ROWS, ContributionEngine
+from model_registry import ModelRegistry
+from prediction_cache import PREDICTION_CACHE
+from prediction_log import PredictionLogger
+from schema import sample_profiles
+
+BASE_DIR = os.path.dirname(__file__)
+# A pipeline pickle, a model_artifact.py directory or a model_registry.py
+# directory of versions.
+MODEL_PATH = os.environ.get("SALARY_MODEL_PATH", os.path.join(BASE_DIR, "best_model_pipeline2.pkl"))
+PREDICTION_LOG_DIR = os.environ.get("SALARY_PREDICTION_LOG")
+# Summary of the training data written by `prediction_log.py reference`.
+DRIFT_REFERENCE_PATH = os.environ.get("SALARY_DRIFT_REFERENCE", os.path.join(BASE_DIR, "reference_summary.json"))
+
+
+@st.cache_resource
+def model_registry():
+    try:
+        return ModelRegistry(MODEL_PATH, cache=PREDICTION_CACHE).start()
+    except FileNotFoundError:
+        st.error(f"Error: Model file not found at {MODEL_PATH}. Please ensure 'best_model_pipeline2.pkl' is in the same directory as 'app.py'.")
+        st.stop()
+    except Exception as e:
+        st.error(f"Error loading model: {e}")
+        st.stop()
+
+
+def get_predictor():
+    """The active predictor. Fetch it once per run; a swap only affects later runs."""
+    return model_registry().predictor()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def contribution_engine(_predictor, model_hash):
+    """The predictor's ContributionEngine, or None if its model is not supported."""
+    try:
+        return ContributionEngine.from_predictor(_predictor)
+    except ValueError:
+        return None
+
+
+@st.cache_data(persist="disk", max_entries=4, show_spinner="Computing feature importances...")
+def global_importances(_engine, model_hash):
+    return _engine.global_importances(sample_profiles(IMPORTANCE_ROWS, seed=0))
+
+
+@st.cache_resource
+def prediction_logger():
+    """The process's PredictionLogger, or None when logging is off or pyarrow is missing."""
+    if not PREDICTION_LOG_DIR:
+        return None
+    try:
+        return PredictionLogger(PREDICTION_LOG_DIR)
+    except ImportError:
+        st.warning("SALARY_PREDICTION_LOG is set, but pyarrow is not installed, so predictions are not logged.")
+        return None
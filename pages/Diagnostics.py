@@ -0,0 +1,102 @@
+import streamlit as st
+
+from assets import apply_page_style
+from layout import render_back_button
+from metrics import METRICS, WINDOW
+from model_store import DRIFT_REFERENCE_PATH, model_registry, prediction_logger
+from prediction_log import drift_report, load_summary
+from prediction_cache import PREDICTION_CACHE
+
+st.set_page_config(
+    page_title="Diagnostics",
+    page_icon="🩺",
+    layout="centered",
+    initial_sidebar_state="collapsed"
+)
+
+apply_page_style(
+    missing_background_css=".stApp { background-color: white; }",
+    missing_background_message="Background image not loaded for this page. Using default styling."
+)
+
+st.markdown("<h1 style='text-align: center; color: #111111;'>🩺 Diagnostics 🩺</h1>", unsafe_allow_html=True)
+st.markdown("<p class='explanation-text'>Prediction timings and counters for this server process.</p>", unsafe_allow_html=True)
+
+st.markdown("---")
+
+if not METRICS.enabled:
+    st.info(
+        "Per-stage timing is disabled. Start the app with `SALARY_METRICS=1 streamlit run app.py` to record it. "
+        "Set `SALARY_METRICS_PORT` as well to serve the Prometheus text at `http://127.0.0.1:<port>/metrics`."
+    )
+
+# Refresh and reset rerun only this fragment, not the page chrome.
+@st.fragment
+def metrics_panel():
+    col1, col2 = st.columns(2)
+    col1.button("Refresh", key="diagnostics_refresh")
+    if col2.button("Reset timings", key="diagnostics_reset"):
+        METRICS.reset()
+
+    snapshot = METRICS.snapshot()
+
+    st.subheader("Stage Latency")
+    if snapshot["stages"]:
+        st.write(f"Percentiles are over the last {WINDOW:,} observations of each stage; counts are since startup.")
+        st.dataframe(
+            [{"stage": name, **summary} for name, summary in snapshot["stages"].items()],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.write("No predictions have been timed yet.")
+
+    st.subheader("Counters")
+    counters = dict(snapshot["counters"])
+    counters.update({name: round(value, 4) for name, value in snapshot["gauges"].items()})
+    if counters:
+        st.dataframe([{"metric": k, "value": v} for k, v in sorted(counters.items())], use_container_width=True, hide_index=True)
+    else:
+        st.write("Nothing has been counted yet.")
+
+    st.subheader("Model")
+    st.json(model_registry().status())
+
+    st.subheader("Prediction Cache")
+    st.json(PREDICTION_CACHE.stats())
+
+    st.subheader("Prediction Log")
+    logger = prediction_logger()
+    if logger is None:
+        st.write("Not logging. Set `SALARY_PREDICTION_LOG` to a directory to log every prediction there.")
+    else:
+        st.json(logger.stats())
+        summary = logger.summary_snapshot()
+        if summary.rows:
+            st.write("Approximate quantiles of the logged inputs:")
+            st.dataframe(
+                [{"input": column, **{f"p{round(q * 100)}": value for q, value in summary.quantiles(column).items()}}
+                 for column in ("age", "hours-per-week", "capital-gain")],
+                use_container_width=True, hide_index=True
+            )
+            reference = load_summary(DRIFT_REFERENCE_PATH)
+            if reference is None:
+                st.write(
+                    f"No drift reference at `{DRIFT_REFERENCE_PATH}`. "
+                    "Create one with `python prediction_log.py reference adult.csv`."
+                )
+            else:
+                st.write("Input drift against the training data (PSI; above 0.1 is a moderate and above 0.25 a major shift):")
+                st.dataframe(drift_report(reference, summary), use_container_width=True, hide_index=True)
+
+    st.subheader("Prometheus Export")
+    text = METRICS.prometheus_text(PREDICTION_CACHE)
+    st.download_button("Download metrics.txt", text, file_name="metrics.txt", mime="text/plain")
+    with st.expander("Show Prometheus text"):
+        st.code(text, language="text")
+
+
+metrics_panel()
+
+st.markdown("---")
+
+render_back_button()
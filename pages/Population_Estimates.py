@@ -0,0 +1,102 @@
+import streamlit as st
+
+from aggregate import DIMENSIONS, dimension_label, load_or_build
+from assets import apply_page_style
+from batch import DEFAULT_CHUNK_SIZE, SchemaError, detect_format
+from layout import render_back_button, render_footer
+from model_store import get_predictor
+
+st.set_page_config(
+    page_title="Population Estimates",
+    page_icon="📊",
+    layout="centered",
+    initial_sidebar_state="collapsed"
+)
+
+apply_page_style(
+    missing_background_css=".stApp { background-color: white; }",
+    missing_background_message="Background image not loaded for this page. Using default styling."
+)
+
+st.markdown("<h1 style='text-align: center; color: #111111;'>📊 Population Estimates 📊</h1>", unsafe_allow_html=True)
+st.markdown("<p class='explanation-text'>How many people the model expects to earn >50K, broken down any way you like.</p>", unsafe_allow_html=True)
+
+st.markdown("---")
+
+st.write(
+    "Upload a survey-style dataset with the 13 predictor columns. Every record is weighted by its `fnlwgt`, "
+    "the number of people it represents, so the shares below are population estimates rather than row counts. "
+    "If the file has an `income` column, the observed share is shown as well. The file is scored once; "
+    "changing the breakdown afterwards only re-adds stored sums."
+)
+
+predictor = get_predictor()
+uploaded_file = st.file_uploader("Survey records", type=["csv", "parquet"], key="population_upload")
+if uploaded_file is not None and st.button("Score Dataset", key="population_button"):
+    progress_bar = st.progress(0.0, text="Scoring...")
+
+    def report_progress(rows_done, fraction_done):
+        progress_bar.progress(fraction_done or 0.0, text=f"Scored {rows_done:,} rows...")
+
+    try:
+        cube = load_or_build(
+            predictor, uploaded_file, detect_format(uploaded_file.name),
+            chunksize=DEFAULT_CHUNK_SIZE, progress=report_progress
+        )
+        progress_bar.progress(1.0, text=f"{cube.rows:,} rows ready.")
+        st.session_state["population_cube"] = (uploaded_file.name, cube)
+    except SchemaError as e:
+        progress_bar.empty()
+        st.error(str(e))
+    except Exception as e:
+        progress_bar.empty()
+        st.error(f"An error occurred while scoring the dataset: {e}")
+
+# Changing the breakdown reruns only this fragment; the data is not rescored.
+@st.fragment
+def estimates_panel():
+    if "population_cube" not in st.session_state:
+        return
+    source_name, cube = st.session_state["population_cube"]
+    st.subheader(f"Estimates for {source_name}")
+    st.write(
+        f"{cube.rows:,} records representing {cube.cells['weight'].sum():,.0f} people"
+        + (f"; {cube.invalid_rows:,} records skipped (missing or non-numeric values)." if cube.invalid_rows else ".")
+    )
+
+    by = st.multiselect(
+        "Break down by", DIMENSIONS, default=["occupation"], max_selections=3,
+        format_func=dimension_label, key="population_by"
+    )
+    min_rows = st.slider("Hide groups with fewer records than", 0, 200, 30, step=10, key="population_min_rows")
+    estimates = cube.estimate(by, min_rows=min_rows)
+    shares = ["expected_share", "predicted_share"] + (["observed_share"] if cube.has_labels else [])
+    st.dataframe(
+        estimates.rename(columns={d: dimension_label(d) for d in by}),
+        use_container_width=True, hide_index=True,
+        column_config={
+            "population": st.column_config.NumberColumn("People", format="%.0f"),
+            "population_share": st.column_config.NumberColumn("Share of population", format="%.3f"),
+            "expected_share": st.column_config.NumberColumn("Expected >50K share", format="%.3f"),
+            "predicted_share": st.column_config.NumberColumn("Predicted >50K share", format="%.3f"),
+            "observed_share": st.column_config.NumberColumn("Observed >50K share", format="%.3f"),
+        }
+    )
+    st.caption(
+        "Expected share averages the model's P(>50K); predicted share counts records predicted >50K; "
+        "observed share uses the file's income labels. All are weighted by fnlwgt."
+    )
+    if len(by) == 1 and len(estimates):
+        st.bar_chart(estimates.set_index(by[0])[shares])
+    st.download_button(
+        "Download Estimates", estimates.to_csv(index=False),
+        file_name="population_estimates.csv", mime="text/csv", key="population_download"
+    )
+
+
+estimates_panel()
+
+st.markdown("---")
+
+render_back_button()
+render_footer()
@@ -0,0 +1,105 @@
+"""Process-wide LRU cache of single-record predictions.
+
+The predictor's inputs are bounded sliders and fixed vocabularies, so the
+same profiles are submitted again and again. Entries are keyed on the
+model hash and the canonical input tuple, so results from an old model
+file are never served. Entries of several models live side by side while
+a model registry swaps versions; the LRU bound evicts the retired ones.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from schema import FEATURE_COLUMNS, NUMERIC_COLUMNS
+
+DEFAULT_MAXSIZE = 4096
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def canonical_key(record):
+    """Normalize a record into a hashable tuple in FEATURE_COLUMNS order.
+
+    ``30``, ``30.0`` and ``numpy.int64(30)`` all give the same key, and
+    category strings are stripped of surrounding whitespace.
+    """
+    key = []
+    for column in FEATURE_COLUMNS:
+        value = record[column]
+        if column in NUMERIC_COLUMNS:
+            value = float(value)
+            if value.is_integer():
+                value = int(value)
+        else:
+            value = str(value).strip()
+        key.append(value)
+    return tuple(key)
+
+
+class PredictionCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_hash, key):
+        with self._lock:
+            try:
+                value = self._entries[model_hash, key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model_hash, key))
+            self.hits += 1
+            return value
+
+    def put(self, model_hash, key, value):
+        with self._lock:
+            self._entries[model_hash, key] = value
+            self._entries.move_to_end((model_hash, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, model_hash, record, compute):
+        # compute() runs outside the lock, so a slow prediction does not
+        # block lookups from other sessions. Two sessions missing on the same
+        # key at once both compute it; the second put just refreshes it.
+        # compute() gets the canonical record, so the cached value is the
+        # one any record with this key would get.
+        key = canonical_key(record)
+        value = self.get(model_hash, key)
+        if value is None:
+            value = compute(dict(zip(FEATURE_COLUMNS, key)))
+            self.put(model_hash, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "models": len({model_hash for model_hash, _ in self._entries}),
+            }
+
+
+# Shared by every session in this server process.
+PREDICTION_CACHE = PredictionCache()
@@ -0,0 +1,422 @@
+"""Buffered Parquet log of interactive predictions with streaming input summaries.
+
+    SALARY_PREDICTION_LOG=prediction_log streamlit run app.py
+    python prediction_log.py reference adult.csv --out reference_summary.json
+    python prediction_log.py drift prediction_log --reference reference_summary.json
+    python prediction_log.py compact prediction_log
+
+``PredictionLogger.log`` only appends the row to an in-memory buffer. A
+daemon thread writes the buffer out as one Parquet part file. It does so
+once the buffer holds ``flush_rows`` rows, every ``flush_seconds``, and
+at exit. Each row holds the 13 inputs, the prediction, the >50K
+probability, the latency, the model hash and a timestamp.
+``pd.read_parquet(directory)`` reads every part. ``compact`` merges the
+parts into one file, leaving recent parts to the writers.
+
+The same thread folds each flushed batch into an ``InputSummary``. The
+summary keeps category counts, plus fixed-bin histograms of the numeric
+inputs and of the probability. Its size does not grow with the log, and
+the histograms give approximate quantiles. Each logger saves its own as
+``_summary-<host>-<pid>-<random>.json`` next to the parts, so several
+workers, or containers sharing a volume, can use one log directory. ``load_log_summary`` adds them up, and checking drift
+never rescans the log. ``drift`` compares the total with a summary of the
+training data using the
+population stability index (PSI): below 0.1 is stable, 0.1-0.25 is a
+moderate shift, and above 0.25 is a major one.
+"""
+import argparse
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+FLUSH_ROWS = 1000
+FLUSH_SECONDS = 60.0
+# Rows held in memory at most; more are dropped and counted if writes stall.
+MAX_BUFFER_ROWS = 100_000
+# Distinct values counted per categorical column; later ones count as OTHER.
+MAX_CATEGORIES = 64
+OTHER = "__other__"
+# Underscore-prefixed so Parquet readers skip them. One per writing process;
+# a plain "_summary.json" from older versions is still read.
+SUMMARY_PREFIX = "_summary"
+# compact() leaves parts younger than this to the writers.
+COMPACT_MIN_AGE_SECONDS = 2 * 60.0
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+
+
+def _zero_and_log_edges(high, bins):
+    # Most capital gains and losses are 0, so 0 gets a bin of its own.
+    return np.concatenate([[0.0, 1.0], np.geomspace(10, high, bins)])
+
+
+# Bin edges of each sketched column. Values below the first edge or at or
+# above the last one go to an under- or overflow bin.
+SKETCH_EDGES = {
+    "age": np.arange(17, 77, dtype=float),
+    "fnlwgt": np.geomspace(10_000, 1_000_000, 41),
+    "educational-num": np.arange(1, 18, dtype=float),
+    "capital-gain": _zero_and_log_edges(100_000, 33),
+    "capital-loss": _zero_and_log_edges(100_000, 33),
+    "hours-per-week": np.arange(1, 101, dtype=float),
+    "probability": np.linspace(0, 1, 21),
+}
+
+
+class InputSummary:
+    """Category counts and fixed-bin histograms whose size is independent of the rows seen."""
+
+    def __init__(self, rows=0, categories=None, histograms=None):
+        self.rows = rows
+        self.categories = categories or {column: {} for column in CATEGORICAL_COLUMNS}
+        self.histograms = histograms or {
+            column: np.zeros(len(edges) + 1, dtype=np.int64) for column, edges in SKETCH_EDGES.items()
+        }
+
+    @classmethod
+    def from_frame(cls, frame):
+        summary = cls()
+        summary.update(frame)
+        return summary
+
+    def update(self, frame):
+        """Add the rows of a DataFrame with the input columns and, optionally, ``probability``."""
+        self.rows += len(frame)
+        for column, counts in self.categories.items():
+            for value, n in frame[column].astype(str).str.strip().value_counts().items():
+                if value not in counts and len(counts) >= MAX_CATEGORIES:
+                    value = OTHER
+                counts[value] = counts.get(value, 0) + int(n)
+        for column, edges in SKETCH_EDGES.items():
+            if column in frame:
+                values = pd.to_numeric(frame[column], errors="coerce").dropna().to_numpy()
+                self.histograms[column] += np.bincount(
+                    np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1
+                )
+
+    def merge(self, other):
+        """Add the counts of another InputSummary into this one."""
+        self.rows += other.rows
+        for column, counts in self.categories.items():
+            for value, n in other.categories[column].items():
+                if value not in counts and len(counts) >= MAX_CATEGORIES:
+                    value = OTHER
+                counts[value] = counts.get(value, 0) + n
+        for column in SKETCH_EDGES:
+            self.histograms[column] += other.histograms[column]
+        return self
+
+    def quantiles(self, column, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """Approximate quantiles of a sketched column, interpolated within bins."""
+        counts = self.histograms[column]
+        total = counts.sum()
+        if not total:
+            return {q: None for q in qs}
+        edges = SKETCH_EDGES[column]
+        lows = np.concatenate([edges[:1], edges])
+        highs = np.concatenate([edges, edges[-1:]])
+        cumulative = np.cumsum(counts)
+        result = {}
+        for q in qs:
+            target = q * total
+            i = int(np.searchsorted(cumulative, target, side="left"))
+            fraction = (target - (cumulative[i] - counts[i])) / counts[i] if counts[i] else 0.0
+            result[q] = float(lows[i] + fraction * (highs[i] - lows[i]))
+        return result
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "categories": self.categories,
+            "histograms": {column: counts.tolist() for column, counts in self.histograms.items()},
+            "edges": {column: edges.tolist() for column, edges in SKETCH_EDGES.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Raises ValueError if the summary was made with other bin edges."""
+        for column, edges in SKETCH_EDGES.items():
+            saved = data["edges"].get(column)
+            if saved is None or len(saved) != len(edges) or not np.allclose(saved, edges):
+                raise ValueError(f"The summary's bins for {column!r} differ from this version's.")
+        histograms = {column: np.asarray(data["histograms"][column], dtype=np.int64) for column in SKETCH_EDGES}
+        categories = {column: dict(data["categories"].get(column, {})) for column in CATEGORICAL_COLUMNS}
+        return cls(data["rows"], categories, histograms)
+
+
+def save_summary(summary, path):
+    staging = path + ".tmp"
+    with open(staging, "w") as f:
+        json.dump(summary.to_dict(), f)
+    os.replace(staging, path)
+
+
+def load_summary(path):
+    """The InputSummary saved at ``path``, or None if there is none."""
+    try:
+        with open(path) as f:
+            return InputSummary.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def writer_id():
+    """A name no other writer to a shared log directory will use.
+
+    The pid alone is not enough: containers sharing a volume all tend to run as pid 1.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def summary_path(directory, writer):
+    return os.path.join(directory, f"{SUMMARY_PREFIX}-{writer}.json")
+
+
+def summary_files(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(SUMMARY_PREFIX) and name.endswith(".json")
+    )
+
+
+def load_log_summary(directory, exclude=None):
+    """The sum of every writer's summary in a log directory, or None if there is none.
+
+    ``exclude`` is a summary path to leave out, e.g. a live logger's own.
+    """
+    total = None
+    for path in summary_files(directory):
+        if path == exclude:
+            continue
+        summary = load_summary(path)
+        if summary is not None:
+            total = summary if total is None else total.merge(summary)
+    return total
+
+
+def psi(expected, actual):
+    """Population stability index of two count vectors; None if either is empty."""
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if not expected.sum() or not actual.sum():
+        return None
+    # Half a count in every bin keeps empty bins finite.
+    p = (expected + 0.5) / (expected.sum() + 0.5 * len(expected))
+    q = (actual + 0.5) / (actual.sum() + 0.5 * len(actual))
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def drift_report(reference, current):
+    """PSI of every column between two InputSummary objects, largest first."""
+    rows = []
+    for column in FEATURE_COLUMNS + ["probability"]:
+        if column in CATEGORICAL_COLUMNS:
+            values = sorted(set(reference.categories[column]) | set(current.categories[column]))
+            value = psi(
+                [reference.categories[column].get(v, 0) for v in values],
+                [current.categories[column].get(v, 0) for v in values],
+            )
+        else:
+            value = psi(reference.histograms[column], current.histograms[column])
+        if value is not None:
+            status = "major" if value > PSI_MAJOR else "moderate" if value > PSI_MODERATE else "stable"
+            rows.append({"column": column, "psi": value, "status": status})
+    return sorted(rows, key=lambda row: -row["psi"])
+
+
+class PredictionLogger:
+    """Buffers prediction rows and writes them as Parquet parts from a daemon thread."""
+
+    def __init__(self, directory, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS, max_buffer_rows=MAX_BUFFER_ROWS):
+        import pyarrow  # noqa: F401  (the parts are Parquet; fail here, not on the first flush)
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_buffer_rows = max_buffer_rows
+        # This logger's rows only; other writers keep their own files.
+        self.writer = writer_id()
+        self.summary_path = summary_path(directory, self.writer)
+        self.summary = InputSummary()
+        self.rows_written = 0
+        self.files_written = 0
+        self.dropped = 0
+        self.last_error = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        # Separate from the buffer lock so log() never waits for a summary update.
+        self._summary_lock = threading.Lock()
+        # Serializes writers: the daemon thread and close().
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record, prediction, probability, latency_seconds, model_hash=None):
+        """Queue one prediction; never touches the disk."""
+        row = {column: record[column] for column in FEATURE_COLUMNS}
+        row.update(
+            prediction=int(prediction), probability=float(probability), latency_ms=latency_seconds * 1000.0,
+            model_hash=model_hash, logged_at=time.time(),
+        )
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer_rows:
+                self.dropped += 1
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one part file and fold them into the summary."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            frame = pd.DataFrame(rows)
+            name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{self.writer}-{self.files_written:05d}.parquet"
+            # Dot-prefixed files are skipped by Parquet readers, so a reader
+            # never sees a part that is still being written.
+            staging = os.path.join(self.directory, "." + name)
+            try:
+                frame.to_parquet(staging, index=False, compression="zstd")
+                os.replace(staging, os.path.join(self.directory, name))
+            except Exception as e:
+                self.dropped += len(frame)
+                self.last_error = str(e)
+                try:
+                    os.remove(staging)
+                except OSError:
+                    pass
+                # Dropped rows stay out of the summary, which must match the parts.
+                return len(frame)
+            self.rows_written += len(frame)
+            self.files_written += 1
+            with self._summary_lock:
+                self.summary.update(frame)
+                try:
+                    save_summary(self.summary, self.summary_path)
+                except OSError as e:
+                    self.last_error = str(e)
+            return len(frame)
+
+    def summary_snapshot(self):
+        """This logger's running summary plus the other writers' saved ones, as a copy."""
+        with self._summary_lock:
+            snapshot = InputSummary.from_dict(self.summary.to_dict())
+        others = load_log_summary(self.directory, exclude=self.summary_path)
+        return snapshot.merge(others) if others is not None else snapshot
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "rows_written": self.rows_written,
+            "files_written": self.files_written,
+            "buffered": self.buffered,
+            "dropped": self.dropped,
+            "summarized_rows": self.summary.rows,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._wake.set()
+            self._thread.join(timeout=self.flush_seconds)
+            self.flush()
+
+
+def compact(directory, min_age_seconds=COMPACT_MIN_AGE_SECONDS):
+    """Merge the part files in ``directory`` into one; returns the number merged.
+
+    Staging files and parts modified in the last ``min_age_seconds`` are
+    left alone, so a writer that is still producing them is never raced.
+    """
+    cutoff = time.time() - min_age_seconds
+    parts = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("part-") and name.endswith(".parquet")
+        and os.path.getmtime(os.path.join(directory, name)) <= cutoff
+    )
+    if len(parts) < 2:
+        return 0
+    frame = pd.concat([pd.read_parquet(os.path.join(directory, name)) for name in parts], ignore_index=True)
+    name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{writer_id()}-compacted.parquet"
+    staging = os.path.join(directory, "." + name)
+    frame.to_parquet(staging, index=False, compression="zstd")
+    os.replace(staging, os.path.join(directory, name))
+    for part in parts:
+        os.remove(os.path.join(directory, part))
+    return len(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prediction log summaries and drift checks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reference = sub.add_parser("reference", help="summarize training data as the drift reference")
+    reference.add_argument("data", help="Adult-style CSV, cleaned as train.py does")
+    reference.add_argument("--out", default="reference_summary.json")
+    reference.add_argument("--model", help="also sketch this model's >50K probability on the data")
+    drift = sub.add_parser("drift", help="compare a log's summary with the reference")
+    drift.add_argument("log", help="prediction log directory or summary JSON")
+    drift.add_argument("--reference", default="reference_summary.json")
+    drift.add_argument("--json", help="also write the report to this file")
+    merge = sub.add_parser("compact", help="merge a log's part files into one")
+    merge.add_argument("log")
+    merge.add_argument("--min-age", type=float, default=COMPACT_MIN_AGE_SECONDS,
+                       help="skip parts modified in the last this many seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "reference":
+        from train import clean_adult
+
+        features, _ = clean_adult(pd.read_csv(args.data, skipinitialspace=True))
+        if args.model:
+            from inference import load_predictor
+            features["probability"] = load_predictor(args.model).predict_frame(features)[1]
+        save_summary(InputSummary.from_frame(features), args.out)
+        print(f"wrote {args.out} from {len(features):,} rows")
+    elif args.command == "drift":
+        path = args.log
+        current = load_log_summary(path) if os.path.isdir(path) else load_summary(path)
+        reference = load_summary(args.reference)
+        if current is None or reference is None:
+            parser.error(f"no summary at {path if current is None else args.reference}")
+        report = drift_report(reference, current)
+        print(f"{current.rows:,} logged rows")
+        print(f"{'column':>16} {'PSI':>8}  status")
+        for row in report:
+            print(f"{row['column']:>16} {row['psi']:>8.4f}  {row['status']}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"rows": current.rows, "report": report}, f, indent=2)
+    else:
+        print(f"merged {compact(args.log, args.min_age)} part files")
+
+
+if __name__ == "__main__":
+    main()
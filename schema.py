@@ -0,0 +1,132 @@
+import numpy as np
+
+# Column layout and input vocabularies of best_model_pipeline2.pkl.
+# FEATURE_COLUMNS is the order the ColumnTransformer was fitted on; its
+# numeric passthrough columns are selected by position, so frames handed
+# to the pipeline must keep this order.
+
+FEATURE_COLUMNS = [
+    'age', 'workclass', 'fnlwgt', 'educational-num', 'marital-status',
+    'occupation', 'relationship', 'race', 'gender', 'capital-gain',
+    'capital-loss', 'hours-per-week', 'native-country'
+]
+
+NUMERIC_COLUMNS = [
+    'age', 'fnlwgt', 'educational-num', 'capital-gain', 'capital-loss',
+    'hours-per-week'
+]
+
+CATEGORICAL_COLUMNS = [c for c in FEATURE_COLUMNS if c not in NUMERIC_COLUMNS]
+
+WORKCLASS_OPTIONS = [
+    "Private", "Self-emp-not-inc", "Local-gov", "State-gov",
+    "Self-emp-inc", "Federal-gov", "Without-pay", "Never-worked"
+]
+
+OCCUPATION_OPTIONS = [
+    "Prof-specialty", "Craft-repair", "Exec-managerial",
+    "Adm-clerical", "Sales", "Other-service", "Machine-op-inspct",
+    "Transport-moving", "Handlers-cleaners", "Farming-fishing",
+    "Tech-support", "Protective-serv", "Priv-house-serv",
+    "Armed-Forces"
+]
+
+GENDER_OPTIONS = ["Male", "Female"]
+
+MARITAL_STATUS_OPTIONS = [
+    "Married-civ-spouse", "Never-married", "Divorced",
+    "Separated", "Widowed", "Married-spouse-absent", "Married-AF-spouse"
+]
+
+RELATIONSHIP_OPTIONS = [
+    "Husband", "Not-in-family", "Own-child", "Unmarried",
+    "Wife", "Other-relative"
+]
+
+RACE_OPTIONS = [
+    "White", "Black", "Asian-Pac-Islander", "Amer-Indian-Eskimo", "Other"
+]
+
+NATIVE_COUNTRY_OPTIONS = [
+    "United-States", "Mexico", "Philippines", "Germany", "Canada",
+    "Puerto-Rico", "El-Salvador", "India", "Cuba", "England",
+    "Jamaica", "South", "China", "Italy", "Dominican-Republic",
+    "Vietnam", "Guatemala", "Japan", "Poland", "Columbia",
+    "Taiwan", "Haiti", "Iran", "Portugal", "Nicaragua",
+    "Peru", "France", "Greece", "Ecuador", "Ireland",
+    "Hong", "Cambodia", "Trinadad&Tobago", "Laos", "Thailand",
+    "Yugoslavia", "Outlying-US(Guam-USVI-etc)", "Hungary",
+    "Honduras", "Scotland", "Holand-Netherlands"
+]
+
+CATEGORY_OPTIONS = {
+    'workclass': WORKCLASS_OPTIONS,
+    'marital-status': MARITAL_STATUS_OPTIONS,
+    'occupation': OCCUPATION_OPTIONS,
+    'relationship': RELATIONSHIP_OPTIONS,
+    'race': RACE_OPTIONS,
+    'gender': GENDER_OPTIONS,
+    'native-country': NATIVE_COUNTRY_OPTIONS,
+}
+
+# (min, max) of the numeric widgets in app.py.
+NUMERIC_RANGES = {
+    'age': (17, 75),
+    'fnlwgt': (10000, 1000000),
+    'educational-num': (1, 16),
+    'capital-gain': (0, 100000),
+    'capital-loss': (0, 100000),
+    'hours-per-week': (1, 99),
+}
+
+SALARY_LABELS = {0: "<=50K", 1: ">50K"}
+
+# Display names of the input columns, as on the predictor form.
+ATTRIBUTE_LABELS = {
+    'age': "Age",
+    'educational-num': "Educational Years",
+    'hours-per-week': "Hours per Week",
+    'capital-gain': "Capital Gain",
+    'capital-loss': "Capital Loss",
+    'fnlwgt': "Fnlwgt (Final Weight)",
+    'workclass': "Workclass",
+    'occupation': "Occupation",
+    'marital-status': "Marital Status",
+    'relationship': "Relationship",
+    'race': "Race",
+    'gender': "Gender",
+    'native-country': "Native Country",
+}
+
+
+def missing_columns(columns):
+    columns = set(columns)
+    return [c for c in FEATURE_COLUMNS if c not in columns]
+
+
+def income_labels(values):
+    """0/1 labels from an Adult ``income`` column; NaN where the value is neither label."""
+    import pandas as pd
+
+    codes = {label: code for code, label in SALARY_LABELS.items()}
+    # adult.test writes its labels as '<=50K.' and '>50K.'.
+    return pd.Series(values).astype(str).str.strip().str.rstrip(".").map(codes)
+
+
+def sample_profiles(n, seed=0):
+    """Random profiles drawn from the predictor's widget ranges and vocabularies."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column in FEATURE_COLUMNS:
+        if column in NUMERIC_RANGES:
+            low, high = NUMERIC_RANGES[column]
+            values = rng.integers(low, high + 1, n)
+            if column in ("capital-gain", "capital-loss"):
+                # Most census records have no capital gain or loss at all.
+                values = np.where(rng.random(n) < 0.85, 0, values)
+            data[column] = values
+        else:
+            data[column] = rng.choice(CATEGORY_OPTIONS[column], n)
+    return pd.DataFrame(data, columns=FEATURE_COLUMNS)
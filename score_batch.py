@@ -0,0 +1,116 @@
+"""Score a CSV or Parquet file with the salary model, without Streamlit.
+
+    python score_batch.py employees.csv predictions.csv --workers 8 --chunk-size 50000
+
+Chunks are scored in a process pool. Each worker loads the model once,
+and results are written in input order as they complete. --model also
+accepts a directory written by model_artifact.py; workers then share its
+memory-mapped node tables instead of each unpickling a copy.
+
+--cascade-trees and --cascade-threshold score gradient boosting models
+through cascade.py's early exit: the first N trees answer confident rows,
+and the full model scores the rest. Tune the threshold with
+``python cascade.py`` first; it also reports whether the cascade beats
+the plain classifier on your data.
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import (
+    DEFAULT_CHUNK_SIZE, ResultWriter, SchemaError, add_to_summary, detect_format, iter_chunks,
+    new_summary, score_chunk, validate_columns
+)
+from inference import load_predictor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+
+_worker_predictor = None
+
+
+def _init_worker(model_path, cascade=None):
+    global _worker_predictor
+    _worker_predictor = load_predictor(model_path)
+    if cascade is not None:
+        from cascade import cascade_predictor
+        _worker_predictor = cascade_predictor(_worker_predictor, *cascade)
+
+
+def _score_in_worker(chunk):
+    return score_chunk(_worker_predictor, chunk)
+
+
+def score_parallel(input_path, output_path, model_path=MODEL_PATH, chunksize=DEFAULT_CHUNK_SIZE,
+                   workers=None, progress=None, cascade=None):
+    """Score ``input_path`` into ``output_path`` using ``workers`` processes.
+
+    At most two chunks per worker are in flight at once, so memory stays
+    bounded however large the input is. ``cascade`` is an optional
+    ``(n_trees, threshold)`` pair for early-exit scoring.
+    """
+    fmt = detect_format(input_path)
+    validate_columns(input_path, fmt)
+    workers = workers or os.cpu_count() or 1
+    summary = new_summary()
+
+    def collect(scored, writer):
+        writer.write(scored)
+        add_to_summary(summary, scored)
+        if progress is not None:
+            progress(summary["rows"])
+
+    with ResultWriter(output_path) as writer, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(model_path, cascade)
+    ) as executor:
+        pending = collections.deque()
+        for chunk, _ in iter_chunks(input_path, fmt, chunksize):
+            pending.append(executor.submit(_score_in_worker, chunk))
+            if len(pending) >= 2 * workers:
+                collect(pending.popleft().result(), writer)
+        while pending:
+            collect(pending.popleft().result(), writer)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score employee records with the salary prediction model.")
+    parser.add_argument("input", help="CSV or Parquet file with the 13 model input columns")
+    parser.add_argument("output", help="where to write the scored file (.csv or .parquet)")
+    parser.add_argument("--model", default=MODEL_PATH, help="pipeline pickle or model artifact directory (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows per chunk sent to a worker (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: %(default)s)")
+    parser.add_argument("--cascade-trees", type=int,
+                        help="score with an early-exit first stage of this many trees (see cascade.py)")
+    parser.add_argument("--cascade-threshold", type=float, default=0.9,
+                        help="first-stage confidence needed to skip the full model (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        summary = score_parallel(
+            args.input, args.output, model_path=args.model, chunksize=args.chunk_size,
+            workers=args.workers,
+            cascade=(args.cascade_trees, args.cascade_threshold) if args.cascade_trees else None,
+            progress=lambda rows: print(f"\rscored {rows:,} rows", end="", file=sys.stderr, flush=True),
+        )
+    except SchemaError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(
+        f"{summary['rows']:,} rows in {elapsed:.1f}s ({summary['rows'] / max(elapsed, 1e-9):,.0f} rows/s), "
+        f"{summary['above_50k']:,} predicted >50K, {summary['invalid_rows']:,} skipped",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
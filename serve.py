@@ -0,0 +1,276 @@
+"""Local JSON prediction service for the salary model.
+
+    python serve.py --port 8502 --max-batch-size 256 --max-wait-ms 5
+
+POST /predict with one record, a list of records, or {"records": [...]},
+using the same 13 columns as the predictor form. Concurrent requests are
+merged into micro-batches, up to --max-batch-size rows or --max-wait-ms
+of waiting. Each batch is scored with one model call on a worker thread,
+so the event loop keeps accepting connections.
+
+GET /health returns {"status": "ok"}. GET /stats returns the batching
+counters. GET /metrics returns the Prometheus text dump; per-stage timings
+are included when SALARY_METRICS=1 (see metrics.py).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch import prepare_features
+from inference import load_predictor
+from metrics import METRICS
+from schema import FEATURE_COLUMNS, NUMERIC_COLUMNS, SALARY_LABELS, missing_columns
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model_pipeline2.pkl")
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+class RequestError(ValueError):
+    pass
+
+
+def content_length(headers):
+    """The request's Content-Length as a non-negative int (0 when absent)."""
+    value = headers.get("content-length", "")
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        raise RequestError(f"Invalid Content-Length header: {value!r}.")
+    return int(value)
+
+
+class MicroBatcher:
+    """Coalesce concurrent ``submit`` calls into single ``predict_frame`` calls."""
+
+    def __init__(self, predictor, max_batch_size=256, max_wait_ms=5.0):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = asyncio.Queue()
+        # One inference thread: batches run one after another while the
+        # loop gathers the next batch.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._task = None
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, features):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _collect(self):
+        items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            frame = pd.concat([features for features, _ in items], ignore_index=True)
+            try:
+                predictions, probabilities = await loop.run_in_executor(
+                    self._executor, self.predictor.predict_frame, frame
+                )
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(frame)
+            self.requests += len(items)
+            start = 0
+            for features, future in items:
+                end = start + len(features)
+                if not future.done():
+                    future.set_result((predictions[start:end], probabilities[start:end]))
+                start = end
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+
+def parse_records(body):
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RequestError(f"Invalid JSON: {e}")
+    if isinstance(payload, dict) and "records" in payload:
+        payload = payload["records"]
+    records = [payload] if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        raise RequestError("Expected a record object, a list of records, or {\"records\": [...]}.")
+
+    for i, record in enumerate(records):
+        missing = missing_columns(record)
+        if missing:
+            raise RequestError(f"Record {i} is missing: {', '.join(missing)}.")
+    features, valid = prepare_features(pd.DataFrame(records, columns=FEATURE_COLUMNS))
+    # json.loads accepts NaN, Infinity and overflowing literals such as 1e400.
+    valid &= np.isfinite(features[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)).all(axis=1)
+    if not valid.all():
+        bad = [int(i) for i in (~valid).nonzero()[0][:10]]
+        raise RequestError(f"Records {bad} have missing, non-numeric or non-finite numeric fields.")
+    return features
+
+
+class PredictionServer:
+    def __init__(self, batcher, cache=None):
+        self.batcher = batcher
+        self.cache = cache
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line."}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = content_length(headers)
+                except RequestError as e:
+                    # Without a usable length the body cannot be skipped, so close.
+                    await self.respond(writer, 400, {"error": str(e)}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                status, payload = await self.route(method, path.split("?", 1)[0], body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok"}
+        if path == "/stats" and method == "GET":
+            return 200, self.batcher.stats()
+        if path == "/metrics" and method == "GET":
+            return 200, METRICS.prometheus_text(self.cache)
+        if path == "/predict":
+            if method != "POST":
+                return 405, {"error": "Use POST for /predict."}
+            try:
+                features = parse_records(body)
+            except RequestError as e:
+                return 400, {"error": str(e)}
+            try:
+                predictions, probabilities = await self.batcher.submit(features)
+            except Exception as e:
+                return 500, {"error": f"Prediction failed: {e}"}
+            return 200, {"predictions": [
+                {"prediction": int(p), "label": SALARY_LABELS[int(p)], "probability": None if np.isnan(q) else float(q)}
+                for p, q in zip(predictions, probabilities)
+            ]}
+        return 404, {"error": f"No route for {method} {path}."}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 500: "Internal Server Error"}
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(predictor, host, port, max_batch_size, max_wait_ms):
+    batcher = MicroBatcher(predictor, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    batcher.start()
+    server = await asyncio.start_server(PredictionServer(batcher, predictor.cache).handle_connection, host, port)
+    print(f"Serving predictions on http://{host}:{port}/predict "
+          f"(max batch {max_batch_size} rows, max wait {max_wait_ms} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve salary predictions over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--model", default=MODEL_PATH, help="pipeline pickle or model artifact directory (default: %(default)s)")
+    parser.add_argument("--max-batch-size", type=int, default=256,
+                        help="rows merged into one model call (default: %(default)s)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="how long a batch waits for more requests (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    predictor = load_predictor(args.model)
+    try:
+        asyncio.run(serve(predictor, args.host, args.port, args.max_batch_size, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
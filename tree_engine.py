@@ -0,0 +1,486 @@
+"""Array-based evaluator for the tree models behind the salary pipeline.
+
+``compile_model`` copies every fitted tree of a GradientBoostingClassifier,
+RandomForest/ExtraTrees/DecisionTree classifier, or a VotingClassifier over
+them, into one set of flat NumPy node tables. ``CompiledModel`` then walks
+all trees for a block of rows at once: one gather per tree level, instead of
+sklearn's per-estimator Python calls. That makes single rows and small
+batches several times faster than sklearn. Large batches are evaluated in
+``BLOCK_ROWS`` blocks so memory stays flat, but sklearn's compiled loops
+remain faster there (about 40k against 80k rows/s on the shipped model).
+
+Predictions match the sklearn objects bit for bit. Inputs are cast to
+float32 like sklearn does, and contributions are summed tree by tree in
+the same order. Run ``python tree_engine.py`` to check this against the
+shipped pipeline and to time both paths.
+"""
+import numpy as np
+from scipy.special import expit
+
+from metrics import METRICS
+
+# sklearn is only imported by the compile_* functions, so evaluators
+# rebuilt from saved arrays (see model_artifact.py) never load it.
+
+# Rows evaluated together. Each tree level of a block works on
+# (BLOCK_ROWS, n_trees) index arrays, so this bounds the working memory
+# (about 1 MB per array for the shipped 487 trees).
+BLOCK_ROWS = 256
+
+
+def in_blocks(fn, X, *row_args, block_rows=BLOCK_ROWS):
+    """``fn(X_block, *row_arg_blocks)`` over row blocks of ``X``, concatenated.
+
+    ``row_args`` are per-row arrays (or None) sliced alongside ``X``.
+    Functions returning a tuple of arrays are concatenated element-wise.
+    """
+    if X.shape[0] <= block_rows:
+        return fn(X, *row_args)
+    parts = [
+        fn(X[i:i + block_rows], *(None if a is None else a[i:i + block_rows] for a in row_args))
+        for i in range(0, X.shape[0], block_rows)
+    ]
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(p) for p in zip(*parts))
+    return np.concatenate(parts)
+
+
+class TreeArrays:
+    """Node tables of several trees concatenated into flat arrays.
+
+    Leaves point to themselves on both sides with a +inf threshold, so a
+    batch can be stepped ``max_depth`` times without tracking which rows
+    already reached a leaf.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        # (right, left) child of every node, so a branch is one take at
+        # 2 * node + go_left. Artifacts store it, so mapped replicas share it too.
+        self.children = np.stack([right, left], axis=1).ravel() if children is None else children
+
+    @classmethod
+    def from_trees(cls, trees, leaf_values):
+        """``leaf_values(tree_)`` returns the per-node output array of one tree."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n_nodes = tree.node_count
+            nodes = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(leaf_values(tree))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+        )
+
+    ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots", "children")
+    # Derived from left and right; rebuilt when an older artifact lacks it.
+    OPTIONAL_ARRAY_NAMES = ("children",)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays, max_depth):
+        return cls(max_depth=max_depth, **{name: arrays[name] for name in cls.ARRAY_NAMES if name in arrays})
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def head(self, n_trees):
+        """The first ``n_trees`` trees; their nodes are a prefix of every table."""
+        if n_trees >= self.n_trees:
+            return self
+        end = self.roots[n_trees]
+        return TreeArrays(
+            feature=self.feature[:end], threshold=self.threshold[:end], left=self.left[:end],
+            right=self.right[:end], value=self.value[:end], roots=self.roots[:n_trees],
+            max_depth=self.max_depth, children=self.children[:2 * end],
+        )
+
+    def tail(self, start):
+        """The trees from index ``start`` on, re-indexed to begin at node 0."""
+        offset = self.roots[start]
+        return TreeArrays(
+            feature=self.feature[offset:], threshold=self.threshold[offset:],
+            left=self.left[offset:] - offset, right=self.right[offset:] - offset,
+            value=self.value[offset:], roots=self.roots[start:] - offset, max_depth=self.max_depth,
+            children=self.children[2 * offset:] - offset,
+        )
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees).
+
+        Temporaries have the same shape, so callers pass blocks of at most
+        ``BLOCK_ROWS`` rows.
+        """
+        n_rows, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        row_starts = (np.arange(n_rows) * n_features)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        for _ in range(self.max_depth):
+            # Flat takes are much cheaper than 2-D fancy indexing. NaN
+            # compares False and goes right, as in sklearn.
+            go_left = flat.take(row_starts + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + go_left)
+        return nodes
+
+
+class GradientBoostingMember:
+    """Binary GradientBoostingClassifier: prior log-odds plus scaled tree sums."""
+
+    kind = "gradient_boosting"
+
+    def __init__(self, classes, learning_rate, init_raw, trees):
+        self.classes_ = classes
+        self.learning_rate = learning_rate
+        self.init_raw = init_raw
+        self.trees = trees
+
+    @classmethod
+    def from_estimator(cls, model):
+        from sklearn.dummy import DummyClassifier
+
+        if model.n_trees_per_iteration_ != 1:
+            raise ValueError("Only binary GradientBoostingClassifier models can be compiled.")
+        if not (model.init_ == "zero" or isinstance(model.init_, DummyClassifier)):
+            raise ValueError("Only the default prior (or 'zero') init estimator can be compiled.")
+        # The prior does not depend on X, so one dummy row gives the constant.
+        init_raw = float(model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0, 0])
+        trees = TreeArrays.from_trees(
+            [est.tree_ for est in model.estimators_[:, 0]],
+            lambda tree: tree.value[:, 0, 0],
+        )
+        return cls(model.classes_, model.learning_rate, init_raw, trees)
+
+    def truncated(self, n_trees):
+        """The model after its first ``n_trees`` boosting stages, as in ``staged_predict``."""
+        return GradientBoostingMember(self.classes_, self.learning_rate, self.init_raw, self.trees.head(n_trees))
+
+    def remainder(self, n_trees):
+        """The stages after the first ``n_trees``, to continue a truncated sum with ``raw_predict(X, start)``."""
+        return GradientBoostingMember(self.classes_, self.learning_rate, None, self.trees.tail(n_trees))
+
+    def raw_predict(self, X, start=None):
+        return in_blocks(self._raw_predict, X, start)
+
+    def _raw_predict(self, X, start):
+        leaves = self.trees.apply(X)
+        # sklearn adds learning_rate * value tree by tree starting from the
+        # prior; cumsum is a sequential sum, so the rounding is identical,
+        # also when continuing from the sum of earlier stages (``start``).
+        terms = np.empty((X.shape[0], self.trees.n_trees + 1))
+        terms[:, 0] = self.init_raw if start is None else start
+        terms[:, 1:] = self.learning_rate * self.trees.value.take(leaves)
+        # Copy the last column, or the view keeps the whole cumsum alive.
+        return np.cumsum(terms, axis=1)[:, -1].copy()
+
+    def predict_and_proba(self, X):
+        return self.decide(self.raw_predict(X))
+
+    def decide(self, raw):
+        """Predictions and probabilities from raw log-odds scores."""
+        proba = np.empty((raw.shape[0], 2))
+        proba[:, 1] = expit(raw)
+        proba[:, 0] = 1 - proba[:, 1]
+        return self.classes_[(raw >= 0).astype(int)], proba
+
+    def predict_proba(self, X):
+        return self.predict_and_proba(X)[1]
+
+    def predict(self, X):
+        return self.classes_[(self.raw_predict(X) >= 0).astype(int)]
+
+
+class ForestMember:
+    """RandomForest/ExtraTrees (or a single tree): mean of per-tree class fractions."""
+
+    kind = "forest"
+
+    def __init__(self, classes, is_forest, trees):
+        self.classes_ = classes
+        self.is_forest = is_forest
+        self.trees = trees
+
+    @classmethod
+    def from_estimator(cls, model):
+        from sklearn.ensemble._forest import ForestClassifier
+
+        if model.n_outputs_ != 1:
+            raise ValueError("Only single-output tree classifiers can be compiled.")
+        n_classes = len(model.classes_)
+        is_forest = isinstance(model, ForestClassifier)
+        trees = TreeArrays.from_trees(
+            [est.tree_ for est in (model.estimators_ if is_forest else [model])],
+            lambda tree: tree.value[:, 0, :n_classes],
+        )
+        return cls(model.classes_, is_forest, trees)
+
+    def truncated(self, n_trees):
+        """A forest of the first ``n_trees`` trees."""
+        return ForestMember(self.classes_, self.is_forest, self.trees.head(n_trees))
+
+    def predict_proba(self, X):
+        return in_blocks(self._predict_proba, X)
+
+    def _predict_proba(self, X):
+        leaves = self.trees.apply(X)
+        per_tree = self.trees.value[leaves]
+        if not self.is_forest:
+            return per_tree[:, 0, :]
+        # Same order as the forest's running sum over estimators, then the mean.
+        proba = np.cumsum(per_tree, axis=1)[:, -1, :].copy()
+        proba /= self.trees.n_trees
+        return proba
+
+    def predict_and_proba(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0), proba
+
+    def predict(self, X):
+        return self.predict_and_proba(X)[0]
+
+
+def compile_member(model):
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.ensemble._forest import ForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, Pipeline):
+        if any(step not in (None, "passthrough") for _, step in model.steps[:-1]):
+            raise ValueError("Ensemble members with their own preprocessing steps cannot be compiled.")
+        model = model.steps[-1][1]
+    if isinstance(model, GradientBoostingClassifier):
+        return GradientBoostingMember.from_estimator(model)
+    if isinstance(model, (ForestClassifier, DecisionTreeClassifier)):
+        return ForestMember.from_estimator(model)
+    raise ValueError(f"Cannot compile estimator of type {type(model).__name__}.")
+
+
+class VotingModel:
+    """Soft or hard VotingClassifier over compiled members."""
+
+    kind = "voting"
+
+    def __init__(self, voting, classes, members, weights):
+        self.voting = voting
+        self.classes_ = classes
+        self.members = members
+        self.weights = weights
+        # Metric names for each member, e.g. "member.0.forest".
+        self._stage_names = [f"member.{i}.{member.kind}" for i, member in enumerate(members)]
+
+    def _member_outputs(self, method, X):
+        outputs = []
+        for member, stage in zip(self.members, self._stage_names):
+            with METRICS.stage(stage):
+                outputs.append(getattr(member, method)(X))
+        return np.asarray(outputs)
+
+    @classmethod
+    def from_estimator(cls, model):
+        members = [compile_member(est) for est in model.estimators_]
+        return cls(model.voting, model.classes_, members, model._weights_not_none)
+
+    def truncated(self, n_trees):
+        """The same vote over members cut to ``n_trees`` trees each."""
+        return VotingModel(self.voting, self.classes_, [m.truncated(n_trees) for m in self.members], self.weights)
+
+    def predict_proba(self, X):
+        if self.voting == "hard":
+            raise AttributeError("predict_proba is not available when voting='hard'")
+        probas = self._member_outputs("predict_proba", X)
+        with METRICS.stage("vote"):
+            return np.average(probas, axis=0, weights=self.weights)
+
+    def predict_and_proba(self, X):
+        if self.voting == "hard":
+            # Hard voting has no probability; callers get NaN in its place.
+            return self.predict(X), np.full((X.shape[0], len(self.classes_)), np.nan)
+        proba = self.predict_proba(X)
+        return self.classes_[np.argmax(proba, axis=1)], proba
+
+    def predict(self, X):
+        if self.voting == "soft":
+            return self.predict_and_proba(X)[0]
+        else:
+            # Members were fitted on label-encoded targets, so their
+            # predictions are already class indices.
+            votes = self._member_outputs("predict", X).T
+            with METRICS.stage("vote"):
+                encoded = np.apply_along_axis(
+                    lambda x: np.argmax(np.bincount(x, weights=self.weights)), axis=1, arr=votes
+                )
+                return self.classes_[encoded]
+
+
+class CompiledModel:
+    """Drop-in ``predict``/``predict_proba`` for a fitted tree pipeline.
+
+    ``preprocessor`` is the pipeline's own fitted transformer (or None for a
+    bare classifier). The ``*_encoded`` methods skip it and take the
+    already-encoded feature matrix.
+    """
+
+    def __init__(self, preprocessor, evaluator):
+        self.preprocessor = preprocessor
+        self.evaluator = evaluator
+        self.classes_ = evaluator.classes_
+
+    def encode(self, X):
+        if self.preprocessor is not None:
+            X = self.preprocessor.transform(X)
+        return as_float32(X)
+
+    def predict_proba(self, X):
+        return self.evaluator.predict_proba(self.encode(X))
+
+    def predict(self, X):
+        return self.evaluator.predict(self.encode(X))
+
+    def predict_and_proba(self, X):
+        return self.evaluator.predict_and_proba(self.encode(X))
+
+    def predict_proba_encoded(self, X):
+        return self.evaluator.predict_proba(as_float32(X))
+
+    def predict_encoded(self, X):
+        return self.evaluator.predict(as_float32(X))
+
+
+def as_float32(X):
+    if hasattr(X, "toarray"):  # scipy sparse output of the preprocessor
+        X = X.toarray()
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def compile_model(model):
+    """Compile a fitted ``Pipeline(preprocessor, classifier)`` or bare classifier."""
+    from sklearn.ensemble import VotingClassifier
+    from sklearn.pipeline import Pipeline
+
+    preprocessor = None
+    if isinstance(model, Pipeline):
+        if len(model.steps) > 1:
+            preprocessor = model[:-1]
+        model = model.steps[-1][1]
+    if isinstance(model, VotingClassifier):
+        evaluator = VotingModel.from_estimator(model)
+    else:
+        evaluator = compile_member(model)
+    return CompiledModel(preprocessor, evaluator)
+
+
+def verify(pipeline, compiled, X):
+    """Return True if ``compiled`` reproduces ``pipeline`` exactly on frame ``X``.
+
+    For hard voting, ``predict_and_proba`` must return the votes and an
+    all-NaN probability.
+    """
+    expected = pipeline.predict(X)
+    predictions, proba = compiled.predict_and_proba(X)
+    if not (np.array_equal(expected, compiled.predict(X)) and np.array_equal(expected, predictions)):
+        return False
+    if getattr(compiled.evaluator, "voting", None) == "hard":
+        return bool(np.isnan(proba).all())
+    expected_proba = pipeline.predict_proba(X)
+    return np.array_equal(expected_proba, proba) and np.array_equal(expected_proba, compiled.predict_proba(X))
+
+
+def verify_voting(X, y):
+    """Fit small soft and hard RF+GB VotingClassifiers on ``X``, ``y`` and verify both compile exactly."""
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier, VotingClassifier
+
+    results = {}
+    for voting in ("soft", "hard"):
+        model = VotingClassifier([
+            ("rf", RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0)),
+            ("gb", GradientBoostingClassifier(n_estimators=30, random_state=0)),
+        ], voting=voting, weights=[1, 2]).fit(X, y)
+        results[voting] = verify(model, compile_model(model), X)
+    return results
+
+
+def main():
+    import argparse
+    import os
+    import time
+    import tracemalloc
+
+    import joblib
+
+    from schema import sample_profiles
+
+    parser = argparse.ArgumentParser(description="Compile the salary pipeline and compare it with sklearn.")
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "best_model_pipeline2.pkl"))
+    parser.add_argument("--rows", type=int, default=20000, help="validation rows to compare (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=300, help="single-row timing repetitions (default: %(default)s)")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    start = time.perf_counter()
+    compiled = compile_model(pipeline)
+    print(f"compiled in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    X = sample_profiles(args.rows)
+    print(f"bit-exact on {args.rows:,} rows: {verify(pipeline, compiled, X)}")
+
+    encoded = compiled.encode(X)
+    classifier = pipeline.steps[-1][1]
+    voting_rows = min(args.rows, 3000)
+    voting = verify_voting(encoded[:voting_rows], pipeline.predict(X.iloc[:voting_rows]))
+    print("bit-exact RF+GB voting: " + ", ".join(f"{mode} {ok}" for mode, ok in voting.items()))
+
+    batches = {
+        "sklearn classifier": lambda: classifier.predict_proba(encoded),
+        "compiled evaluator": lambda: compiled.predict_proba_encoded(encoded),
+    }
+    for name, fn in batches.items():
+        fn()
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name + f' ({args.rows:,} encoded rows)':<42} {args.rows / seconds:9,.0f} rows/s, peak {peak / 2**20:6.1f} MB")
+    row = X.iloc[:1]
+    encoded_row = encoded[:1]
+    timings = {
+        "sklearn pipeline.predict_proba (1 row)": lambda: pipeline.predict_proba(row),
+        "compiled predict_proba (1 row)": lambda: compiled.predict_proba(row),
+        "sklearn classifier on encoded row": lambda: classifier.predict_proba(encoded_row),
+        "compiled evaluator on encoded row": lambda: compiled.predict_proba_encoded(encoded_row),
+    }
+    for name, fn in timings.items():
+        fn()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        print(f"{name:<42} {(time.perf_counter() - start) / args.repeat * 1e6:9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""What-if sensitivity grids around one employee profile.
+
+Sweeps one or two attributes over their full widget range while holding
+the rest of the profile fixed. The whole grid is scored as one batch, so
+a 59 x 99 age by hours-per-week heatmap is a single model call.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import ATTRIBUTE_LABELS, CATEGORY_OPTIONS, FEATURE_COLUMNS, NUMERIC_RANGES
+
+SWEEPABLE_ATTRIBUTES = list(ATTRIBUTE_LABELS)
+
+# Wide numeric ranges (fnlwgt, capital gain/loss) are sampled at this many
+# evenly spaced points instead of every widget step.
+MAX_NUMERIC_POINTS = 101
+
+
+def sweep_values(attribute):
+    if attribute in CATEGORY_OPTIONS:
+        return list(CATEGORY_OPTIONS[attribute])
+    low, high = NUMERIC_RANGES[attribute]
+    if high - low + 1 <= MAX_NUMERIC_POINTS:
+        return list(range(low, high + 1))
+    return sorted(set(np.linspace(low, high, MAX_NUMERIC_POINTS).round().astype(int).tolist()))
+
+
+def build_grid(profile, x_attribute, y_attribute=None):
+    """Return the grid as a DataFrame plus the x and y values it spans.
+
+    Rows are ordered y-major, so reshaping the scores to
+    ``(len(y_values), len(x_values))`` gives the heatmap.
+    """
+    x_values = sweep_values(x_attribute)
+    y_values = sweep_values(y_attribute) if y_attribute else [None]
+    n_rows = len(x_values) * len(y_values)
+
+    columns = {c: np.repeat(np.asarray([profile[c]], dtype=object), n_rows) for c in FEATURE_COLUMNS}
+    columns[x_attribute] = np.tile(np.asarray(x_values, dtype=object), len(y_values))
+    if y_attribute:
+        columns[y_attribute] = np.repeat(np.asarray(y_values, dtype=object), len(x_values))
+
+    grid = pd.DataFrame(columns, columns=FEATURE_COLUMNS)
+    for column in NUMERIC_RANGES:
+        grid[column] = grid[column].astype(np.int64)
+    return grid, x_values, y_values
+
+
+def what_if_grid(predictor, profile, x_attribute, y_attribute=None):
+    """P(>50K) over the sweep as a DataFrame indexed by y, with x as columns."""
+    if y_attribute == x_attribute:
+        y_attribute = None
+    grid, x_values, y_values = build_grid(profile, x_attribute, y_attribute)
+    probabilities = predictor.predict_proba_frame(grid)
+    return pd.DataFrame(
+        np.asarray(probabilities).reshape(len(y_values), len(x_values)),
+        index=pd.Index(y_values, name=y_attribute),
+        columns=pd.Index(x_values, name=x_attribute),
+    )
+
+
+def heatmap_figure(scores, profile):
+    # A bare Figure keeps pyplot's global state out of concurrent sessions.
+    from matplotlib.figure import Figure
+
+    x_attribute, y_attribute = scores.columns.name, scores.index.name
+    x_values, y_values = list(scores.columns), list(scores.index)
+    fig = Figure(figsize=(8, max(3.0, min(0.28 * len(y_values), 9.0))))
+    ax = fig.subplots()
+    image = ax.imshow(scores.to_numpy(), aspect="auto", origin="lower", cmap="RdYlGn", vmin=0.0, vmax=1.0)
+    fig.colorbar(image, ax=ax, label="P(>50K)")
+
+    def label_axis(axis_values, set_ticks, set_labels):
+        # Label every category, but only about ten points of a numeric range.
+        if isinstance(axis_values[0], str) or len(axis_values) <= 20:
+            positions = range(len(axis_values))
+        else:
+            positions = np.linspace(0, len(axis_values) - 1, 10).round().astype(int)
+        set_ticks(list(positions))
+        set_labels([str(axis_values[i]) for i in positions])
+
+    label_axis(x_values, ax.set_xticks, lambda labels: ax.set_xticklabels(labels, rotation=60, ha="right", fontsize=8))
+    label_axis(y_values, ax.set_yticks, lambda labels: ax.set_yticklabels(labels, fontsize=8))
+    ax.set_xlabel(ATTRIBUTE_LABELS[x_attribute])
+    ax.set_ylabel(ATTRIBUTE_LABELS[y_attribute])
+
+    # Mark the current profile if it lies on the grid.
+    if profile[x_attribute] in x_values and profile[y_attribute] in y_values:
+        ax.plot(x_values.index(profile[x_attribute]), y_values.index(profile[y_attribute]),
+                marker="o", markersize=10, markerfacecolor="none", markeredgecolor="black", markeredgewidth=2)
+    fig.tight_layout()
+    return fig